@@ -82,3 +82,47 @@ USE_TZ = True
 URL_PREFIX = os.getenv('URL_PREFIX', default='.')
 STATIC_URL = f'/{URL_PREFIX}/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+
+# Parsing of restaurant menus (seconds)
+PARSE_WORKERS = int(os.getenv('LUNCHINATOR_PARSE_WORKERS', default='8'))
+PARSE_TIMEOUT = float(os.getenv('LUNCHINATOR_PARSE_TIMEOUT', default='60'))
+PARSE_DEADLINE = float(os.getenv('LUNCHINATOR_PARSE_DEADLINE', default='120'))
+PARSE_PROCESSES = int(os.getenv('LUNCHINATOR_PARSE_PROCESSES', default='2'))  # for CPU-bound parsers
+
+# HTTP connections of restaurant parsers (pool size per host, retries, timeout in seconds)
+PARSER_HTTP_POOL_SIZE = int(os.getenv('LUNCHINATOR_PARSER_HTTP_POOL_SIZE', default='4'))
+PARSER_HTTP_RETRIES = int(os.getenv('LUNCHINATOR_PARSER_HTTP_RETRIES', default='2'))
+PARSER_HTTP_TIMEOUT = float(os.getenv('LUNCHINATOR_PARSER_HTTP_TIMEOUT', default='20'))
+
+# On-disk cache of restaurant pages and parsed meals, empty to disable (TTL in seconds)
+PARSER_CACHE_DIR = os.getenv('LUNCHINATOR_PARSER_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache'))
+PARSER_CACHE_TTL = float(os.getenv('LUNCHINATOR_PARSER_CACHE_TTL', default=str(7 * 24 * 3600)))
+
+# Offline fixtures of restaurant pages: 'record' downloads into the directory, 'replay' serves pages from it
+PARSER_FIXTURES_MODE = os.getenv('LUNCHINATOR_PARSER_FIXTURES_MODE', default='')
+PARSER_FIXTURES_DIR = os.getenv('LUNCHINATOR_PARSER_FIXTURES_DIR',
+                                default=os.path.join(BASE_DIR, 'restaurants', 'fixtures'))
+
+# Parsers failing PARSE_BREAKER_THRESHOLD times in a row are skipped for a backoff doubling up to the maximum (seconds)
+PARSE_BREAKER_THRESHOLD = int(os.getenv('LUNCHINATOR_PARSE_BREAKER_THRESHOLD', default='3'))
+PARSE_BREAKER_BACKOFF = float(os.getenv('LUNCHINATOR_PARSE_BREAKER_BACKOFF', default='900'))
+PARSE_BREAKER_MAX_BACKOFF = float(os.getenv('LUNCHINATOR_PARSE_BREAKER_MAX_BACKOFF', default=str(24 * 3600)))
+
+# Slack delivery
+SLACK_FANOUT_WORKERS = int(os.getenv('LUNCHINATOR_SLACK_FANOUT_WORKERS', default='8'))
+SLACK_MAX_RETRIES = int(os.getenv('LUNCHINATOR_SLACK_MAX_RETRIES', default='3'))
+
+# Slack Web API connections (URL, pool size, connect retries, timeout in seconds)
+SLACK_API_URL = os.getenv('LUNCHINATOR_SLACK_API_URL', default='https://www.slack.com/api/')
+SLACK_POOL_SIZE = int(os.getenv('LUNCHINATOR_SLACK_POOL_SIZE', default=str(SLACK_FANOUT_WORKERS)))
+SLACK_CONNECT_RETRIES = int(os.getenv('LUNCHINATOR_SLACK_CONNECT_RETRIES', default='2'))
+SLACK_TIMEOUT = float(os.getenv('LUNCHINATOR_SLACK_TIMEOUT', default='30'))
+SLACK_ASYNC_CONCURRENCY = int(os.getenv('LUNCHINATOR_SLACK_ASYNC_CONCURRENCY', default='16'))  # posts to response_url
+
+# Updates of the selections in the lunch channel requested within this window are sent as one (seconds, 0 sends each)
+SLACK_SELECTIONS_DEBOUNCE = float(os.getenv('LUNCHINATOR_SLACK_SELECTIONS_DEBOUNCE', default='2'))
+
+# Background jobs of Slack interactions: 'threads' (in process), 'db' (durable, shared by processes) or 'inline'
+JOB_QUEUE = os.getenv('LUNCHINATOR_JOB_QUEUE', default='threads')
+JOB_WORKERS = int(os.getenv('LUNCHINATOR_JOB_WORKERS', default='4'))
+JOB_POLL_INTERVAL = float(os.getenv('LUNCHINATOR_JOB_POLL_INTERVAL', default='1'))  # seconds, 'db' queue only
@@ -1,7 +1,47 @@
 from django.contrib import admin
-from lunchinator.models import User, Restaurant, Meal, Selection
+from lunchinator import health
+from lunchinator.models import User, Restaurant, Meal, Selection, ParseAttempt, Job
+
+
+@admin.register(Restaurant)
+class RestaurantAdmin(admin.ModelAdmin):
+    """Restaurants with the health of their parsers."""
+    list_display = 'name', 'provider', 'enabled', 'last_parsed', 'last_outcome', 'failures', 'skipped_until'
+
+    @staticmethod
+    def _last_attempt(restaurant):
+        attempts = list(restaurant.parse_attempts.all()[:1])
+        return attempts[0] if attempts else None
+
+    def last_parsed(self, restaurant):
+        attempt = RestaurantAdmin._last_attempt(restaurant)
+        return attempt and attempt.started
+
+    def last_outcome(self, restaurant):
+        attempt = RestaurantAdmin._last_attempt(restaurant)
+        if attempt is None:
+            return None
+        return f'failed: {attempt.error}' if attempt.failed else f'{attempt.meal_count} meals in {attempt.duration:.1f} s'
+
+    def failures(self, restaurant):
+        return len(health.consecutive_failures(restaurant))
+
+    def skipped_until(self, restaurant):
+        return health.retry_after(restaurant)
+
+
+@admin.register(ParseAttempt)
+class ParseAttemptAdmin(admin.ModelAdmin):
+    list_display = 'restaurant', 'started', 'duration', 'meal_count', 'error'
+    list_filter = 'restaurant',
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = 'name', 'state', 'created', 'started', 'finished', 'error'
+    list_filter = 'state', 'name'
+
 
 admin.site.register(User)
-admin.site.register(Restaurant)
 admin.site.register(Meal)
 admin.site.register(Selection)
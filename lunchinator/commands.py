@@ -1,14 +1,23 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import date
+from itertools import chain
 
-from recommender.recommender import Recommender
-from lunchinator.models import User, Selection, Meal, Restaurant
-from lunchinator import SlackUser
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from lunchinator.models import User, Selection, Meal, Restaurant, ParseAttempt
+from lunchinator import SlackUser, isolation, health
 from slack_api.sender import SlackSender
-from restaurants import PARSERS
+from restaurants import PARSERS, fetch, cache
 import traceback
 from typing import Optional, List
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 
+_START_POLL_INTERVAL = 0.1  # seconds between checks for parsers which have started since, see Commands._parse_all
+
 
 class Commands:
 
@@ -20,7 +29,7 @@ class Commands:
         user = Commands.user(slack_user)
         restaurants = set()
 
-        meal = Meal.objects.get(pk=meal_id)
+        meal = Meal.objects.select_related('restaurant').get(pk=meal_id)
         restaurants.add(meal.restaurant)
         selection = Selection.objects.get_or_create(meal=meal, user=user)[0]
         selection.recommended = recommended
@@ -29,28 +38,32 @@ class Commands:
         if recommended:
             self._sender.print_recommendation(self._recommendations[user.slack_id], user)
         self._sender.send_meals(user, list(restaurants))
-        self._sender.post_selections(Commands.today_selections())
+        self._sender.post_selections_later(Commands.today_selections)
 
     def erase_meal(self, slack_user: SlackUser, meal_id: str, recommended: bool):
         user = Commands.user(slack_user)
         restaurants = set()
 
-        selections = user.selections.filter(meal__date=date.today(), meal__pk=meal_id)
+        selections = user.selections \
+            .filter(meal__date=date.today(), meal__pk=meal_id) \
+            .select_related('meal__restaurant')
         restaurants.update({selection.meal.restaurant for selection in selections})
         selections.delete()
 
         if recommended:
             self._sender.print_recommendation(self._recommendations[user.slack_id], user)
-        self._sender.post_selections(Commands.today_selections())
+        self._sender.post_selections_later(Commands.today_selections)
         self.print_selection(slack_user)
         self._sender.send_meals(user, list(restaurants))
 
     def print_selection(self, slack_user: SlackUser):
         user = Commands.user(slack_user)
-        meals = [s.meal for s in user.selections.filter(meal__date=date.today()).all()]
+        meals = [s.meal for s in user.selections.filter(meal__date=date.today()).select_related('meal__restaurant')]
         self._sender.post_selection(user.slack_id, meals)
 
     def recommend_meals(self, slack_user: SlackUser, number: int):
+        from recommender.recommender import Recommender  # heavy (sklearn, majka), loaded on first use
+
         user = Commands.user(slack_user)
         rec = Recommender(user)
         recs = rec.get_recommendations(number)
@@ -81,55 +94,90 @@ class Commands:
         self._sender.print_restaurants(user.slack_id, Commands.all_restaurants(), user.all_favorite_restaurants())
         self._sender.send_meals(user, Commands.all_restaurants())
 
+    def toggle_digest(self, slack_user: SlackUser):
+        user = Commands.user(slack_user)
+        user.digest = not user.digest
+        user.save()
+        self._sender.send_meals(user, Commands.all_restaurants())
+
+    def digest_page(self, slack_user: SlackUser, page: str):
+        user = Commands.user(slack_user)
+        self._sender.send_meals(user, Commands.all_restaurants(), page=int(page))
+
     def quit(self, slack_user: SlackUser):
         user = Commands.user(slack_user)
         user.enabled = False
         user.save()
         self._sender.message(user.slack_id, "Bye")
 
-    def parse_and_send_meals(self):
+    def parse_and_send_meals(self, reparse: bool = False):
         meal_cnt = Meal.objects.filter(date=date.today()).count()
         print(f"Read {meal_cnt} meals from DB")
 
         restaurants = Commands.all_restaurants()
-
-        if meal_cnt == 0:
-            meals = {r: Commands._parse(r) for r in restaurants}
-            print(f"Parsed {sum(map(len, meals.values()))} meals from {len(meals)} restaurant")
-            for ms in meals.values():
-                for m in ms:
-                    m.save()
+        if reparse:
+            Commands.parse_meals(restaurants)
+        else:
+            Commands.parse_missing_meals(restaurants)
 
         self._sender.reset()
         self._recommendations = {}
-        for user in User.objects.filter(enabled=True).all():
-            self._sender.send_meals(user, restaurants)
+        report = self._sender.send_meals_to_users(User.objects.filter(enabled=True).all(), restaurants)
+        print(f"Sent meals to {report}")
 
     def parse_and_send_meals_for_restaurant(self, restaurant_name: str) -> str:
         try:
             restaurant = Restaurant.objects.get(name=restaurant_name)
         except (ObjectDoesNotExist, MultipleObjectsReturned):
             return 'Restaurant does not exist or is not unique'
-        meal_cnt = Meal.objects.filter(date=date.today(), restaurant=restaurant).count()
-        print(f"Read {meal_cnt} meals from DB for {restaurant}")
 
-        if meal_cnt == 0:
-            meals = Commands._parse(restaurant)
-            print(f"Parsed {len(meals)} meals from {restaurant}")
-            for m in meals:
-                m.save()
+        Commands.parse_meals([restaurant])
 
-        for user in User.objects.filter(enabled=True).all():
-            self._sender.send_meals(user, [restaurant])
+        report = self._sender.send_meals_to_users(User.objects.filter(enabled=True).all(), [restaurant])
+        print(f"Sent meals of {restaurant} to {report}")
         return ''
 
+    @staticmethod
+    def parse_missing_meals(restaurants, record_failures: bool = True) -> list:
+        """Parses and saves meals of the restaurants which have no meals today yet.
+
+            Restaurants whose parsers keep failing are skipped, see lunchinator.health.
+
+            :param record_failures: whether to record failed ParseAttempts too, polls before a menu is published
+                should not count as failures of the parser.
+            :returns restaurants which still have no meals today.
+        """
+        parsed_restaurant_ids = set(
+            Meal.objects.filter(date=date.today()).values_list('restaurant', flat=True).distinct()
+        )
+        Commands.parse_meals([
+            r for r in restaurants if r.pk not in parsed_restaurant_ids and Commands._parser_available(r)
+        ], record_failures=record_failures)
+
+        parsed_restaurant_ids = set(
+            Meal.objects.filter(date=date.today()).values_list('restaurant', flat=True).distinct()
+        )
+        return [r for r in restaurants if r.pk not in parsed_restaurant_ids]
+
+    @staticmethod
+    def parse_meals(restaurants, record_failures: bool = True):
+        """Parses the restaurants and upserts their meals, restaurants whose parsing failed keep their meals."""
+        restaurants = list(restaurants)
+        if not restaurants:
+            return
+
+        meals = Commands._parse_all(restaurants, record_failures)
+        print(f"Parsed {sum(map(len, meals.values()))} meals from {len(meals)} restaurant")
+        for restaurant, ms in meals.items():
+            Commands._save_meals(restaurant, ms)
+
     @staticmethod
     def all_restaurants():
         return Restaurant.objects.filter(enabled=True).all()
 
     @staticmethod
     def today_selections() -> List[Selection]:
-        return Selection.objects.filter(meal__date=date.today()).all()
+        return Selection.objects.filter(meal__date=date.today()).select_related('meal__restaurant', 'user').all()
 
     @staticmethod
     def user(slack_user: SlackUser, allow_create: bool = True) -> Optional[User]:
@@ -145,12 +193,138 @@ class Commands:
             user.save()
         return user
 
+    @staticmethod
+    def _parse_all(restaurants, record_failures: bool = True) -> dict:
+        """Parses meals of all given restaurants concurrently.
+
+            Each parser gets PARSE_TIMEOUT seconds from its start and the whole stage PARSE_DEADLINE seconds,
+            restaurants which do not finish in time are left without meals. Nothing signals a parser starting,
+            so while some have not started yet their start is checked every _START_POLL_INTERVAL seconds.
+
+            The outcome of each restaurant is stored as a ParseAttempt, failures only if record_failures is set.
+
+            :returns dict of successfully parsed restaurant -> list of meals (not saved to db yet).
+        """
+        restaurants = list(restaurants)
+        if not restaurants:
+            return {}
+
+        stage_start = timezone.now()
+        deadline = time.monotonic() + settings.PARSE_DEADLINE
+        started = {}
+        durations = {}
+
+        def parse(restaurant: Restaurant) -> list:
+            started[restaurant] = time.monotonic()
+            try:
+                return Commands._parse(restaurant)
+            finally:
+                durations[restaurant] = time.monotonic() - started[restaurant]
+
+        def expiry(future):
+            restaurant = futures[future]
+            if restaurant in started:
+                return min(started[restaurant] + settings.PARSE_TIMEOUT, deadline)
+            return deadline
+
+        with fetch.run():
+            executor = ThreadPoolExecutor(max_workers=min(settings.PARSE_WORKERS, len(restaurants)))
+            futures = {executor.submit(parse, r): r for r in restaurants}
+            meals = {}
+            errors = {}
+            pending = set(futures.keys())
+
+            try:
+                while pending:
+                    timeout = max(min(map(expiry, pending)) - time.monotonic(), 0)
+                    if any(futures[f] not in started for f in pending):
+                        timeout = min(timeout, _START_POLL_INTERVAL)
+                    done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            meals[futures[future]] = future.result()
+                        except Exception as ex:
+                            errors[futures[future]] = f'{type(ex).__name__}: {ex}'
+
+                    now = time.monotonic()
+                    for future in [f for f in pending if expiry(f) <= now]:
+                        restaurant = futures[future]
+                        print(f"Timed out parsing {restaurant}")
+                        errors[restaurant] = 'Timed out'
+                        durations[restaurant] = now - started.get(restaurant, now)
+                        future.cancel()
+                        pending.remove(future)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        ParseAttempt.objects.bulk_create([
+            health.attempt(r, stage_start, durations.get(r, 0.0), meals.get(r), errors.get(r))
+            for r in restaurants if r in meals or record_failures
+        ])
+        for stats in cache.report():
+            print(f"Cache {stats}")
+        return meals
+
+    @staticmethod
+    def _parser_available(restaurant: Restaurant) -> bool:
+        retry_after = health.retry_after(restaurant)
+        if retry_after is not None:
+            print(f"Skipping {restaurant} after repeated failures until {retry_after}")
+        return retry_after is None
+
+    @staticmethod
+    def _save_meals(restaurant: Restaurant, meals: list):
+        """Upserts parsed meals of today and of the following days into the stored meals of the restaurant.
+
+            Stored meals matching a parsed one by name keep their id (and thus selections) and get its price,
+            parsed meals without a match are bulk-inserted and stored meals no longer offered are deleted
+            unless somebody has selected them. Days without parsed meals are left as they are.
+        """
+        parsed = {}
+        for m in meals:
+            if m.date >= date.today():
+                parsed.setdefault(m.date, []).append(m)
+
+        with transaction.atomic():
+            stored = {}
+            for m in Meal.objects \
+                    .filter(restaurant=restaurant, date__in=parsed.keys()) \
+                    .annotate(selection_count=Count('selections')) \
+                    .order_by('id'):
+                stored.setdefault((m.date, m.name), []).append(m)
+
+            created, updated = [], []
+            for m in chain.from_iterable(parsed.values()):
+                matches = stored.get((m.date, m.name))
+                if matches:
+                    match = matches.pop(0)
+                    price = None if m.price is None else float(m.price)
+                    if match.price != price:
+                        match.price = price
+                        updated.append(match)
+                else:
+                    created.append(m)
+            removed = [m.pk for m in chain.from_iterable(stored.values()) if m.selection_count == 0]
+
+            Meal.objects.bulk_create(created)
+            Meal.objects.bulk_update(updated, ['price'])
+            Meal.objects.filter(pk__in=removed).delete()
+
+        if created or updated or removed:
+            print(f"Saved meals of {restaurant}: {len(created)} new, {len(updated)} updated, {len(removed)} removed")
+
     @staticmethod
     def _parse(restaurant: Restaurant) -> list:
         try:
-            return PARSERS[restaurant.provider]().get_meals(restaurant)
+            parser_class = PARSERS[restaurant.provider]
+            if parser_class.CPU_BOUND:
+                return [Meal(restaurant=restaurant, **m) for m in isolation.parse(restaurant, settings.PARSE_TIMEOUT)]
+            meals = parser_class().get_cached_meals(restaurant)
+            if meals is None:
+                raise ValueError("Parser returned no list of meals")
+            return meals
         except Exception as ex:
             print("Failed parsing " + str(restaurant))
             print(ex)
             traceback.print_exc()
-            return []
+            raise
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from lunchinator.models import ParseAttempt, Restaurant
+
+_HISTORY = 50
+
+
+def attempt(restaurant: Restaurant, started: datetime, duration: float, meals: list = None, error: str = None):
+    """:returns ParseAttempt (not saved to db yet)."""
+    return ParseAttempt(
+        restaurant=restaurant,
+        started=started,
+        duration=duration,
+        meal_count=len(meals or []),
+        error=error
+    )
+
+
+def consecutive_failures(restaurant: Restaurant) -> list:
+    """Failed attempts since the last successful one, the most recent first."""
+    failures = []
+    for a in restaurant.parse_attempts.all()[:_HISTORY]:
+        if not a.failed:
+            break
+        failures.append(a)
+    return failures
+
+
+def retry_after(restaurant: Restaurant) -> Optional[datetime]:
+    """Time until which the restaurant is not parsed because of repeated failures, None if it can be parsed."""
+    failures = consecutive_failures(restaurant)
+    if len(failures) < settings.PARSE_BREAKER_THRESHOLD:
+        return None
+
+    backoff = min(
+        settings.PARSE_BREAKER_BACKOFF * 2 ** (len(failures) - settings.PARSE_BREAKER_THRESHOLD),
+        settings.PARSE_BREAKER_MAX_BACKOFF
+    )
+    until = failures[0].started + timedelta(seconds=failures[0].duration + backoff)
+    return until if until > timezone.now() else None
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import signal
+import threading
+import traceback
+
+from django.conf import settings
+
+from restaurants import cache
+
+# Only django.conf and restaurants.cache are imported here,
+# the worker process sets Django up before importing models and parsers.
+
+_slots = threading.BoundedSemaphore(settings.PARSE_PROCESSES)
+
+
+def parse(restaurant, timeout: float) -> list:
+    """Runs the restaurant's parser in a separate worker process, killing it if it does not finish in time.
+
+        At most PARSE_PROCESSES workers run at once.
+
+        The worker's cache statistics are merged into this process, see restaurants.cache.report.
+
+        :returns list of dicts with name, price and date of each meal.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    fields = {'pk': restaurant.pk, 'name': restaurant.name, 'provider': restaurant.provider, 'url': restaurant.url}
+
+    with _slots:
+        process = context.Process(target=_main, args=(sender, fields), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(timeout):
+                raise TimeoutError(f"Parser process of {restaurant} did not finish in {timeout} s")
+            succeeded, result, cache_counts = receiver.recv()
+            cache.merge(cache_counts)
+        except EOFError:
+            raise RuntimeError(f"Parser process of {restaurant} crashed")
+        finally:
+            receiver.close()
+            _kill(process)
+
+    if not succeeded:
+        raise RuntimeError(f"Parser process of {restaurant} failed:\n{result}")
+    return result
+
+
+def _kill(process):
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)  # also kills subprocesses, e.g. tesseract
+        except OSError:
+            process.kill()
+    process.join()
+
+
+def _main(sender, fields: dict):
+    os.setsid()
+
+    import django
+    django.setup()
+
+    from lunchinator.models import Restaurant
+    from restaurants import PARSERS
+
+    try:
+        meals = PARSERS[fields['provider']]().get_cached_meals(Restaurant(**fields)) or []
+        sender.send((True, [{'name': m.name, 'price': m.price, 'date': m.date} for m in meals], cache.counts()))
+    except Exception:
+        sender.send((False, traceback.format_exc(), cache.counts()))
+    finally:
+        sender.close()
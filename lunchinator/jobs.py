@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from lunchinator.models import Job
+
+_handlers = {}
+
+
+def handler(name: str):
+    """Registers the decorated function as the handler of jobs of given name, called with the job's arguments."""
+    def register(f: Callable) -> Callable:
+        _handlers[name] = f
+        return f
+    return register
+
+
+@dataclass
+class JobStats:
+    queued: int = 0  # queue depth, jobs waiting for a worker
+    finished: int = 0
+    failed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def __str__(self):
+        done = self.finished or 1
+        return f'{self.queued} queued, {self.finished} finished ({self.failed} failed), ' \
+               f'wait {self.total_wait / done:.2f} s mean / {self.max_wait:.2f} s max, ' \
+               f'latency {self.total_latency / done:.2f} s mean / {self.max_latency:.2f} s max'
+
+
+class JobQueue:
+    """
+    Runs jobs submitted by name (see handler) with JSON-serializable keyword arguments in the background.
+    This variant runs them at once in the submitting thread.
+    """
+
+    def __init__(self):
+        self._stats = JobStats()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, **arguments):
+        assert name in _handlers, f'No handler of {name} jobs'
+        self._queued(1)
+        self._run(name, arguments, time.time())
+
+    def stats(self) -> JobStats:
+        with self._lock:
+            return JobStats(**self._stats.__dict__)
+
+    def _queued(self, count: int):
+        with self._lock:
+            self._stats.queued += count
+
+    def _run(self, name: str, arguments: dict, queued_at: float) -> Optional[str]:
+        """Runs the job, recording its wait time and latency.
+
+            :returns error if the job failed, None otherwise.
+        """
+        start = time.time()
+        error = None
+        try:
+            _handlers[name](**arguments)
+        except Exception as ex:
+            print(f"Failed running {name} job")
+            print(ex)
+            traceback.print_exc()
+            error = f'{type(ex).__name__}: {ex}'
+
+        wait, latency = start - queued_at, time.time() - start
+        with self._lock:
+            s = self._stats
+            s.queued -= 1
+            s.finished += 1
+            s.failed += error is not None
+            s.total_wait += wait
+            s.max_wait = max(s.max_wait, wait)
+            s.total_latency += latency
+            s.max_latency = max(s.max_latency, latency)
+        print(f"Job {name} ran {latency:.2f} s after waiting {wait:.2f} s")
+        return error
+
+
+class ThreadJobQueue(JobQueue):
+    """
+    Runs jobs in a pool of JOB_WORKERS threads. Jobs not run yet are lost when the process exits.
+    """
+
+    def __init__(self, workers: int):
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+    def submit(self, name: str, **arguments):
+        assert name in _handlers, f'No handler of {name} jobs'
+        self._queued(1)
+        self._executor.submit(self._run_in_worker, name, arguments, time.time())
+
+    def _run_in_worker(self, name: str, arguments: dict, queued_at: float):
+        try:
+            self._run(name, arguments, queued_at)
+        finally:
+            connection.close()  # each worker thread has its own DB connection
+
+
+class DbJobQueue(JobQueue):
+    """
+    Stores jobs as Job rows run by JOB_WORKERS threads, so that queued jobs survive a restart and are shared
+    by all processes. The workers start with the first submitted job, they take jobs queued before too.
+
+    Jobs which were running when their process died are not run again, they might have been partly done.
+    """
+
+    def __init__(self, workers: int, poll_interval: float):
+        super().__init__()
+        self._workers = workers
+        self._poll_interval = poll_interval
+        self._started = False
+        self._wake = threading.Event()
+
+    def submit(self, name: str, **arguments):
+        assert name in _handlers, f'No handler of {name} jobs'
+        Job.objects.create(name=name, arguments=json.dumps(arguments))
+        self._start()
+        self._wake.set()
+
+    def stats(self) -> JobStats:
+        stats = super().stats()
+        stats.queued = Job.objects.filter(state=Job.QUEUED).count()
+        return stats
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self._workers):
+            threading.Thread(target=self._work, name=f'job-{i}', daemon=True).start()
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except Exception as ex:
+                print("Failed claiming a job")
+                print(ex)
+                job = None
+            finally:
+                connection.close()
+
+            if job is None:
+                self._wake.wait(self._poll_interval)
+                self._wake.clear()
+                continue
+
+            try:
+                self._queued(1)  # counted by stats() from the DB, _run decrements it
+                error = self._run(job.name, json.loads(job.arguments), job.created.timestamp())
+                job.state = job.FAILED if error else job.DONE
+                job.error = error
+                job.finished = timezone.now()
+                job.save(update_fields=['state', 'error', 'finished'])
+            finally:
+                connection.close()
+
+    @staticmethod
+    def _claim():
+        """:returns the oldest queued job after marking it running, None if there is none."""
+        for job in Job.objects.filter(state=Job.QUEUED)[:10]:
+            started = timezone.now()
+            if Job.objects.filter(pk=job.pk, state=Job.QUEUED).update(state=Job.RUNNING, started=started):
+                job.state, job.started = Job.RUNNING, started
+                return job
+        return None
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def queue() -> JobQueue:
+    """The job queue of the process, of kind JOB_QUEUE ('threads', 'db' or 'inline')."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if settings.JOB_QUEUE == 'threads':
+                _queue = ThreadJobQueue(settings.JOB_WORKERS)
+            elif settings.JOB_QUEUE == 'db':
+                _queue = DbJobQueue(settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL)
+            elif settings.JOB_QUEUE == 'inline':
+                _queue = JobQueue()
+            else:
+                raise ValueError(f'Unknown job queue {settings.JOB_QUEUE}')
+        return _queue
@@ -0,0 +1,18 @@
+import os
+
+from lunchinator.models import Restaurant
+
+EXPECTED_MEALS = 'meals.json'
+
+
+def expected_meals_path(directory: str) -> str:
+    return os.path.join(directory, EXPECTED_MEALS)
+
+
+def parser_restaurant(provider: str, parser_class) -> Restaurant:
+    """Unsaved restaurant to run a parser for outside of the DB."""
+    return Restaurant(pk=0, name=provider, provider=provider, url=parser_class.URL or '')
+
+
+def meal_rows(meals: list) -> list:
+    return [[m.name, m.price, m.date.isoformat()] for m in meals or []]
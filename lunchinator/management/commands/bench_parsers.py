@@ -0,0 +1,63 @@
+import json
+import os
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from lunchinator.management.commands._parsers import parser_restaurant, meal_rows, expected_meals_path
+from restaurants import PARSERS, fetch
+
+
+class Command(BaseCommand):
+    help = 'Runs parsers against recorded fixtures (no network) and reports wall time, peak memory and meals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('parsers', nargs='*', help='parser names, all by default')
+        parser.add_argument('--dir', default=settings.PARSER_FIXTURES_DIR, help='fixtures directory')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        names = options['parsers'] or list(PARSERS.keys())
+        expected = {}
+        if os.path.exists(expected_meals_path(directory)):
+            with open(expected_meals_path(directory)) as f:
+                expected = json.load(f)
+
+        regressions = []
+        with override_settings(PARSER_CACHE_DIR=''), fetch.fixtures('replay', directory):
+            for name in names:
+                parser_class = PARSERS[name]
+                restaurant = parser_restaurant(name, parser_class)
+
+                try:
+                    start = time.perf_counter()
+                    meals = parser_class().get_meals(restaurant)
+                    elapsed = time.perf_counter() - start
+
+                    tracemalloc.start()
+                    parser_class().get_meals(restaurant)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                except Exception as ex:
+                    tracemalloc.stop()
+                    regressions.append(name)
+                    self.stdout.write(f'{name:25} FAILED ({ex})')
+                    continue
+
+                rows = meal_rows(meals)
+                if name not in expected:
+                    status = 'not recorded'
+                elif rows == expected[name]:
+                    status = 'ok'
+                else:
+                    status = 'CHANGED'
+                    regressions.append(name)
+                self.stdout.write(
+                    f'{name:25} {elapsed * 1000:9.1f} ms {peak / 1024:9.0f} KiB {len(rows):4d} meals  {status}'
+                )
+
+        if regressions:
+            raise CommandError(f'Parsers failed or changed output: {", ".join(regressions)}')
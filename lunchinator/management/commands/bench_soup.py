@@ -0,0 +1,48 @@
+import time
+import tracemalloc
+
+import bs4
+from django.core.management.base import BaseCommand
+
+from restaurants import PARSERS
+
+
+class Command(BaseCommand):
+    help = 'Compares full-page and targeted-subtree parsing of saved restaurant pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('parser', help='parser name, e.g. EmpiriaParser')
+        parser.add_argument('pages', nargs='+', help='saved HTML pages')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        restaurant_parser = PARSERS[options['parser']]()
+
+        for path in options['pages']:
+            with open(path, 'rb') as f:
+                html = f.read().decode(restaurant_parser.ENCODING, errors='replace')
+
+            full_time, full_peak = self._measure(
+                lambda: bs4.BeautifulSoup(html, features='html.parser'), options['repeat']
+            )
+            target_time, target_peak = self._measure(
+                lambda: restaurant_parser._make_soup(html), options['repeat']
+            )
+            self.stdout.write(
+                f'{path}: full {full_time * 1000:.1f} ms, {full_peak / 1024:.0f} KiB | '
+                f'targeted {target_time * 1000:.1f} ms, {target_peak / 1024:.0f} KiB | '
+                f'{full_time / target_time:.1f}x faster, {full_peak / max(target_peak, 1):.1f}x less memory'
+            )
+
+    @staticmethod
+    def _measure(parse, repeat: int):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse()
+        elapsed = (time.perf_counter() - start) / repeat
+
+        tracemalloc.start()
+        parse()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
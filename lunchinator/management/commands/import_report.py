@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Reports the import cost of each module needed to start serving (as a web worker does).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', default=['lunchinator.views'], help='modules to import')
+        parser.add_argument('--top', type=int, default=30, help='number of the most expensive modules to list')
+
+    def handle(self, *args, **options):
+        imports = '; '.join(f'import {m}' for m in options['modules'])
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import django; django.setup(); {imports}'],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True
+        )
+
+        timings = []
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            timings.append((int(cumulative_us), int(self_us), module.strip()))
+
+        self.stdout.write(f'{"cumulative ms":>14} {"self ms":>8}  module')
+        for cumulative_us, self_us, module in sorted(timings, reverse=True)[:options['top']]:
+            self.stdout.write(f'{cumulative_us / 1000:14.1f} {self_us / 1000:8.1f}  {module}')
+        self.stdout.write(f'{sum(t[1] for t in timings) / 1000:14.1f} ms in {len(timings)} modules')
@@ -0,0 +1,166 @@
+import json
+import os
+import random
+import shutil
+import string
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from lunchinator.models import Restaurant, Meal, User
+from slack_api.fake import FakeSlack
+
+
+class Command(BaseCommand):
+    help = 'Runs the morning fan-out and /lunch, /lunchrest and button interactions of synthetic users ' \
+           'against a fake Slack in a test DB, reporting latencies and Slack API calls.'
+
+    requires_system_checks = False  # the checks would import the views before the test DB is set up
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--restaurants', type=int, default=8)
+        parser.add_argument('--favourites', type=int, default=3, help='favourite restaurants of each user')
+        parser.add_argument('--interactions', type=int, default=3, help='interactions of each user')
+        parser.add_argument('--clients', type=int, default=8, help='concurrent Slack requests to the app')
+        parser.add_argument('--latency', type=float, default=0.05, help='seconds each fake Slack request takes')
+        parser.add_argument('--rate-limited', type=float, default=0.0, help='share of calls answered by 429')
+        parser.add_argument('--cold', action='store_true', help='users have no known DM channels yet')
+
+    def handle(self, *args, **options):
+        os.environ.setdefault('LUNCHINATOR_TOKEN', 'xoxb-fake')
+        os.environ.setdefault('LUNCHINATOR_LUNCH_CHANNEL', 'CLUNCH')
+
+        fake = FakeSlack(latency=options['latency'], rate_limited=options['rate_limited'])
+        fake.start()
+        directory = tempfile.mkdtemp()
+        if connection.vendor == 'sqlite':  # an in-memory DB would fail on concurrent writes of the worker threads
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'load_test.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(SLACK_API_URL=fake.api_url, JOB_QUEUE='threads', SLACK_SELECTIONS_DEBOUNCE=1):
+                users = self._populate(options)
+                self._run(fake, users, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+            fake.stop()
+
+    def _populate(self, options) -> list:
+        restaurants = [
+            Restaurant.objects.create(
+                name=f'{string.ascii_uppercase[i % 26]}{i:02d} Bistro', provider='None', url='http://localhost/'
+            ) for i in range(options['restaurants'])
+        ]
+        Meal.objects.bulk_create([
+            Meal(name=f'Meal {i} of {r.name}', price=100 + i, restaurant=r) for r in restaurants for i in range(1, 9)
+        ])
+        users = []
+        for i in range(options['users']):
+            user = User.objects.create(
+                slack_id=f'U{i:06d}', name=f'user{i}', slack_channel=None if options['cold'] else f'DU{i:06d}'
+            )
+            user.favorite_restaurants.set(random.sample(restaurants, min(options['favourites'], len(restaurants))))
+            users.append(user)
+        return users
+
+    def _run(self, fake: FakeSlack, users: list, options):
+        from lunchinator import views, jobs  # the views read restaurants of the test DB on import
+
+        views.sender.reset()
+        report = views.sender.send_meals_to_users(users, Restaurant.objects.filter(enabled=True).all())
+        self.stdout.write(f'Fan-out: {report}')
+        self._write_calls(fake)
+
+        requests = [r for user in users for r in self._interactions(fake, user, options['interactions'])]
+        random.shuffle(requests)
+        sent = {}
+
+        def send(request):
+            path, data, response_path = request
+            begin = time.monotonic()
+            response = Client().post(path, data)
+            connection.close()
+            if response_path:
+                sent[response_path] = begin
+            return response.status_code, time.monotonic() - begin
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['clients']) as executor:
+            acks = list(executor.map(send, requests))
+        while jobs.queue().stats().queued > 0:
+            time.sleep(0.1)
+        views.sender.flush_selections()
+        deadline = time.monotonic() + 10
+        while set(sent) - set(fake.responses) and time.monotonic() < deadline:
+            time.sleep(0.1)  # responses are posted in the background
+        duration = time.monotonic() - start
+
+        failed = sum(1 for status, _ in acks if status != 200)
+        self.stdout.write(
+            f'Interactions: {len(requests)} requests ({failed} failed) in {duration:.1f} s, '
+            f'ack {_percentiles([latency for _, latency in acks])}'
+        )
+        responses = [fake.responses[p] - sent[p] for p in sent if p in fake.responses]
+        self.stdout.write(f'Slash responses: {len(responses)}/{len(sent)}, latency {_percentiles(responses)}')
+        self.stdout.write(f'Jobs: {jobs.queue().stats()}')
+        self.stdout.write(f'Messages: {views.sender.update_stats()}')
+        self._write_calls(fake)
+
+    @staticmethod
+    def _interactions(fake: FakeSlack, user: User, count: int) -> list:
+        """:returns list of (path, POST data, response path) of random interactions of the user."""
+        from lunchinator import views
+
+        restaurants = list(user.favorite_restaurants.all())
+        meals = list(Meal.objects.filter(restaurant__in=restaurants))
+        interactions = []
+        for i in range(count):
+            kind = random.choice(['vote', 'vote', 'unvote', 'lunch', 'search', 'lunchrest'])
+            if kind in ('vote', 'unvote'):
+                meal = random.choice(meals)
+                action_id = ('select_meal' if kind == 'vote' else 'remove_meal') + str(meal.pk)
+                payload = {
+                    'type': 'block_actions',
+                    'user': {'id': user.slack_id, 'name': user.name},
+                    'trigger_id': 'trigger',
+                    'actions': [{'action_id': action_id, 'value': str(meal.pk)}]
+                }
+                interactions.append((reverse(views.endpoint), {'payload': json.dumps(payload)}, None))
+            else:
+                response_path = f'/response/{user.slack_id}/{i}'
+                command, text = {
+                    'lunch': ('/lunch', ' '.join(r.name[0] for r in restaurants)),
+                    'search': ('/lunch', 'search meal 1'),
+                    'lunchrest': ('/lunchrest', ''),
+                }[kind]
+                interactions.append((reverse(views.slash), {
+                    'user_id': user.slack_id,
+                    'user_name': user.name,
+                    'command': command,
+                    'text': text,
+                    'response_url': fake.url + response_path
+                }, response_path))
+        return interactions
+
+    def _write_calls(self, fake: FakeSlack):
+        calls = ', '.join(f'{method} {count}' for method, count in sorted(fake.calls.items()))
+        self.stdout.write(f'Slack calls: {sum(fake.calls.values())} ({calls})')
+        fake.calls.clear()
+
+
+def _percentiles(values: list) -> str:
+    if not values:
+        return 'n/a'
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, round(q * (len(values) - 1)))] * 1000
+
+    return f'p50 {at(0.5):.0f} ms, p99 {at(0.99):.0f} ms'
@@ -0,0 +1,81 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lunchinator.commands import Commands
+
+
+class Command(BaseCommand):
+    help = 'Pre-fetches menus on working days before the lunch trigger, re-polling restaurants which have no meals yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default='09:30', help='local time to start polling at (HH:MM)')
+        parser.add_argument('--end', default='11:00', help='local time of the lunch trigger (HH:MM)')
+        parser.add_argument('--min-interval', type=float, default=300, help='seconds before the first re-poll')
+        parser.add_argument('--max-interval', type=float, default=1800, help='longest seconds between re-polls')
+        parser.add_argument('--forever', action='store_true', help='keep running on the following days')
+
+    def handle(self, *args, **options):
+        while True:
+            start, end = self._window(datetime.now(), options['start'], options['end'])
+            if start is None:
+                if not options['forever']:
+                    return
+                self._sleep_until(datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()))
+                continue
+
+            self._sleep_until(start)
+            self._poll(end, options['min_interval'], options['max_interval'])
+            if not options['forever']:
+                return
+            self._sleep_until(end)
+
+    def _poll(self, end: datetime, min_interval: float, max_interval: float):
+        """Polls restaurants without meals until all have them or the trigger is due.
+
+            A restaurant still without meals is re-polled after an interval doubling from min_interval
+            up to max_interval, with a last poll min_interval before the trigger.
+        """
+        intervals = {}
+        next_polls = {}
+
+        while datetime.now() < end:
+            close_old_connections()
+            now = datetime.now()
+            restaurants = list(Commands.all_restaurants())
+            due = [r for r in restaurants if next_polls.get(r.pk, now) <= now]
+
+            # failures not recorded: the breaker would take a menu not published yet for a failing parser
+            # and skip the restaurant at the trigger
+            missing = {r.pk for r in Commands.parse_missing_meals(due, record_failures=False)} if due else set()
+            for r in due:
+                if r.pk in missing:
+                    intervals[r.pk] = min(intervals.get(r.pk, min_interval / 2) * 2, max_interval)
+                    next_poll = now + timedelta(seconds=intervals[r.pk])
+                    last_poll = end - timedelta(seconds=min_interval)
+                    next_polls[r.pk] = min(next_poll, last_poll) if last_poll > now else end
+                else:
+                    next_polls[r.pk] = end
+
+            waiting = [p for p in next_polls.values() if p < end]
+            self.stdout.write(f'{datetime.now():%H:%M} {len(waiting)} restaurants without meals')
+            if not waiting:
+                return
+            self._sleep_until(min(waiting))
+
+    @staticmethod
+    def _window(now: datetime, start: str, end: str):
+        """Today's polling window, (None, None) on weekends or after it is over."""
+        start_time = datetime.combine(now.date(), datetime.strptime(start, '%H:%M').time())
+        end_time = datetime.combine(now.date(), datetime.strptime(end, '%H:%M').time())
+        if now.weekday() >= 5 or now >= end_time:
+            return None, None
+        return start_time, end_time
+
+    @staticmethod
+    def _sleep_until(moment: datetime):
+        seconds = (moment - datetime.now()).total_seconds()
+        if seconds > 0:
+            time.sleep(seconds)
@@ -0,0 +1,34 @@
+import json
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from lunchinator.management.commands._parsers import parser_restaurant, meal_rows, expected_meals_path
+from restaurants import PARSERS, fetch
+
+
+class Command(BaseCommand):
+    help = 'Downloads the pages of all parsers into offline fixtures, together with the meals parsed from them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PARSER_FIXTURES_DIR, help='fixtures directory (replaced)')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        shutil.rmtree(directory, ignore_errors=True)
+
+        expected = {}
+        with override_settings(PARSER_CACHE_DIR=''), fetch.fixtures('record', directory):
+            for name, parser_class in PARSERS.items():
+                try:
+                    meals = parser_class().get_meals(parser_restaurant(name, parser_class))
+                except Exception as ex:
+                    self.stderr.write(f'{name}: failed ({ex})')
+                    continue
+                expected[name] = meal_rows(meals)
+                self.stdout.write(f'{name}: {len(expected[name])} meals')
+
+        with open(expected_meals_path(directory), 'w') as f:
+            json.dump(expected, f, indent=2, sort_keys=True, ensure_ascii=False)
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:12
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0006_add_user_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meal',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0007_meal_date_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+                ('duration', models.FloatField()),
+                ('meal_count', models.IntegerField(default=0)),
+                ('error', models.TextField(null=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parse_attempts', to='lunchinator.Restaurant')),
+            ],
+            options={
+                'ordering': ('-started',),
+                'default_related_name': 'parse_attempts',
+            },
+        ),
+    ]
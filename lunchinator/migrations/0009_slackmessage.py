@@ -0,0 +1,28 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:21
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0008_parseattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=datetime.date.today)),
+                ('recipient', models.CharField(max_length=20)),
+                ('kind', models.CharField(max_length=20)),
+                ('key', models.CharField(blank=True, default='', max_length=20)),
+                ('ts', models.CharField(max_length=32)),
+            ],
+            options={
+                'unique_together': {('date', 'recipient', 'kind', 'key')},
+            },
+        ),
+    ]
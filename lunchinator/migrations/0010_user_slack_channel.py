@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0009_slackmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='slack_channel',
+            field=models.CharField(max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0010_user_slack_channel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackmessage',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0011_slackmessage_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('arguments', models.TextField()),
+                ('state', models.CharField(default='queued', max_length=10)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(null=True)),
+                ('finished', models.DateTimeField(null=True)),
+                ('error', models.TextField(null=True)),
+            ],
+            options={
+                'ordering': ('id',),
+                'index_together': {('state', 'id')},
+            },
+        ),
+    ]
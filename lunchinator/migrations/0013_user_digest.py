@@ -0,0 +1,18 @@
+# Generated by Django 2.2.13 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lunchinator', '0012_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='digest',
+            field=models.BooleanField(default=False),
+        ),
+    ]
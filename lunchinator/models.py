@@ -1,3 +1,5 @@
+import datetime
+
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.db import models
 
@@ -25,6 +27,8 @@ class User(AbstractBaseUser):
     enabled = models.BooleanField(default=True)
     favorite_restaurants = models.ManyToManyField(Restaurant)
     name = models.CharField(max_length=255, null=True)
+    slack_channel = models.CharField(max_length=20, null=True)  # id of the DM channel with the user
+    digest = models.BooleanField(default=False)  # all meals in one message instead of one per restaurant
 
     class Meta:
         verbose_name_plural = 'Users (with favorite restaurants)'
@@ -35,9 +39,13 @@ class User(AbstractBaseUser):
     def all_favorite_restaurants(self):
         return self.favorite_restaurants.filter(enabled=True).all()
 
+    def today_meal_pks(self) -> set:
+        """Ids of the meals the user has selected today."""
+        return set(self.selections.filter(meal__date=datetime.date.today()).values_list('meal_id', flat=True))
+
 
 class Meal(models.Model):
-    date = models.DateField(auto_now=True)
+    date = models.DateField(default=datetime.date.today)
     name = models.CharField(max_length=255)
     price = models.FloatField(null=True)
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
@@ -61,3 +69,62 @@ class Selection(models.Model):
 
     def __str__(self):
         return f'Selection: {self.user.get_username()} - {self.meal.name}' + (' (rec)' if self.recommended else '')
+
+
+class ParseAttempt(models.Model):
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    started = models.DateTimeField()
+    duration = models.FloatField()
+    meal_count = models.IntegerField(default=0)
+    error = models.TextField(null=True)
+
+    class Meta:
+        ordering = '-started',
+        default_related_name = 'parse_attempts'
+
+    def __str__(self):
+        outcome = f'failed ({self.error})' if self.failed else f'{self.meal_count} meals'
+        return f'ParseAttempt: {self.restaurant.name} at {self.started:%Y-%m-%d %H:%M} - {outcome}'
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+
+class SlackMessage(models.Model):
+    """Timestamp of a message sent to a user (or channel) on the day, see slack_api.messages."""
+    date = models.DateField(default=datetime.date.today)
+    recipient = models.CharField(max_length=20)
+    kind = models.CharField(max_length=20)
+    key = models.CharField(max_length=20, default='', blank=True)
+    ts = models.CharField(max_length=32)
+    fingerprint = models.CharField(max_length=64, default='', blank=True)
+
+    class Meta:
+        unique_together = ('date', 'recipient', 'kind', 'key')
+
+    def __str__(self):
+        return f'SlackMessage: {self.date} {self.recipient} {self.kind} {self.key} ({self.ts})'
+
+
+class Job(models.Model):
+    """Background job queued by the DB-backed job queue, see lunchinator.jobs."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=50)
+    arguments = models.TextField()  # JSON object of keyword arguments of the job's handler
+    state = models.CharField(max_length=10, default=QUEUED)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True)
+    finished = models.DateTimeField(null=True)
+    error = models.TextField(null=True)
+
+    class Meta:
+        ordering = 'id',
+        index_together = ('state', 'id'),
+
+    def __str__(self):
+        return f'Job: {self.name} ({self.state})'
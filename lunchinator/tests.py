@@ -1,3 +1,283 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import override_settings, CaptureQueriesContext
+
+from lunchinator import SlackUser, health
+from lunchinator.commands import Commands
+from lunchinator.management.commands import prefetch_menus
+from lunchinator.models import Restaurant, Meal, User, Selection
+from lunchinator.text_commands import TextCommands
+from restaurants import fetch
+from restaurants.abstract_parser import AbstractParser
+from slack_api.api import SlackApi
+from slack_api.sender import SlackSender
+
+RESTAURANTS = 10
+MEALS = 10
+USERS = 30
+FAVOURITES = 4
+
+
+@override_settings(SLACK_FANOUT_WORKERS=1, SLACK_SELECTIONS_DEBOUNCE=0, JOB_QUEUE='inline')
+class QueryCountTest(TestCase):
+    """
+    Query budgets of the hot paths, which must not grow with the number of restaurants, meals or selections.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = [
+            Restaurant.objects.create(name=f'{chr(ord("A") + i)} Restaurant', provider='None', url='http://localhost/')
+            for i in range(RESTAURANTS)
+        ]
+        cls.adhoc = Restaurant.objects.create(name=Restaurant.ADHOC_NAME, provider='None', url='', enabled=False)
+        for r in cls.restaurants:
+            Meal.objects.bulk_create([Meal(name=f'Meal {i} of {r.name}', price=100 + i, restaurant=r)
+                                      for i in range(MEALS)])
+        Meal.objects.create(name='Sushi order', restaurant=cls.adhoc)
+
+        meals = list(Meal.objects.all())
+        cls.users = []
+        for i in range(USERS):
+            user = User.objects.create(slack_id=f'U{i:04d}', name=f'user{i}', slack_channel=f'D{i:04d}')
+            user.favorite_restaurants.set(cls.restaurants[i % RESTAURANTS:][:FAVOURITES])
+            Selection.objects.bulk_create([
+                Selection(meal=meals[(i * 7) % len(meals)], user=user),
+                Selection(meal=meals[(i * 13 + 1) % len(meals)], user=user)
+            ])
+            cls.users.append(user)
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {'LUNCHINATOR_LUNCH_CHANNEL': 'CLUNCH'})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.api = mock.create_autospec(SlackApi, instance=True)
+        self.api.message.return_value = '1.000001'
+        self.api.update_message.side_effect = lambda channel, ts, text, blocks=None: ts
+        self.api.user_channel.side_effect = lambda user_id: 'D' + user_id
+        self.api.retries = 0
+        self.sender = SlackSender()
+        self.sender._api = self.api
+        self.slack_user = SlackUser(self.users[0].slack_id, self.users[0].name)
+
+    def test_post_selections(self):
+        with self.assertNumQueries(5):
+            self.sender.post_selections(Commands.today_selections())
+
+    def test_dashboard(self):
+        from lunchinator import views  # reads restaurants on import, so only once the test DB is set up
+
+        with self.assertNumQueries(1):
+            response = views.dashboard(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_send_meals_to_users(self):
+        with CaptureQueriesContext(connection) as queries:
+            report = self.sender.send_meals_to_users(User.objects.filter(enabled=True), Commands.all_restaurants())
+        self.assertEqual(report.failures, 0)
+        # restaurants, meals and users, then per user its messages, favourites and selections,
+        # and an insert (within a savepoint) of each message sent
+        self.assertEqual(len(queries), 3 + USERS * 3 + self.api.message.call_count * 3)
+
+        with self.assertNumQueries(3 + USERS * 3):
+            self.sender.send_meals_to_users(User.objects.filter(enabled=True), Commands.all_restaurants())
+
+    def test_send_meals_does_not_grow_with_restaurants(self):
+        users = User.objects.filter(enabled=True)
+        self.sender.send_meals_to_users(users, Commands.all_restaurants())
+        with CaptureQueriesContext(connection) as before:
+            self.sender.send_meals_to_users(users, Commands.all_restaurants())
+
+        extra = Restaurant.objects.create(name='Z Restaurant', provider='None', url='http://localhost/')
+        Meal.objects.bulk_create([Meal(name=f'Meal {i} of Z', restaurant=extra) for i in range(MEALS)])
+        for user in self.users:
+            user.favorite_restaurants.add(extra)
+        self.sender.send_meals_to_users(users, Commands.all_restaurants())
+        with CaptureQueriesContext(connection) as after:
+            self.sender.send_meals_to_users(users, Commands.all_restaurants())
+
+        self.assertEqual(len(before), len(after))
+
+    def test_digest(self):
+        User.objects.filter(pk=self.users[0].pk).update(digest=True)
+        user = User.objects.get(pk=self.users[0].pk)
+        self.sender.send_meals(user, Commands.all_restaurants())
+        with self.assertNumQueries(6):
+            self.sender.send_meals(user, Commands.all_restaurants())
+
+    def test_select_meal(self):
+        meal = Meal.objects.filter(restaurant=self.restaurants[0]).first()
+        with self.assertNumQueries(19):
+            Commands(self.sender).select_meal(self.slack_user, str(meal.pk), recommended=False)
+
+    def test_erase_meal(self):
+        selection = self.users[0].selections.first()
+        with self.assertNumQueries(24):
+            Commands(self.sender).erase_meal(self.slack_user, str(selection.meal_id), recommended=False)
+
+    def test_search_meals(self):
+        with self.assertNumQueries(5):
+            response = TextCommands._search_meals(self.slack_user, ['meal', '1'])
+        self.assertIn('Found meals', response['text'])
+
+    def test_print_restaurant_offers(self):
+        text_commands = TextCommands(self.sender)
+        with self.assertNumQueries(3):
+            response = text_commands.lunch_cmd(self.slack_user, 'A B C D')
+        self.assertEqual(len(response['blocks']), 4 * (MEALS + 2))
+
+    def test_vote_by_text(self):
+        text_commands = TextCommands(self.sender)
+        with self.assertNumQueries(17):
+            response = text_commands.lunch_cmd(self.slack_user, 'A1,2 B3')
+        self.assertEqual(response['text'], 'voted')
+
+
+class SharedMessagesTest(TestCase):
+    """
+    Messages updated by several workers, each with its own SlackSender.
+    """
+
+    def test_update_after_other_worker_is_not_skipped(self):
+        restaurant = Restaurant.objects.create(name='A Restaurant', provider='None', url='http://localhost/')
+        meal = Meal.objects.create(name='Soup', restaurant=restaurant)
+
+        api = mock.create_autospec(SlackApi, instance=True)
+        api.message.return_value = '1.000001'
+        api.update_message.side_effect = lambda channel, ts, text, blocks=None: ts
+        workers = [SlackSender(), SlackSender()]
+        for worker in workers:
+            worker._api = api
+
+        workers[0].post_selection('U0001', [])
+        workers[1].post_selection('U0001', [meal])
+        workers[0].post_selection('U0001', [])
+
+        self.assertEqual(api.update_message.call_count, 2)
+        self.assertEqual(workers[0].update_stats().skipped, 0)
+
+
+class ParseTimeoutTest(TestCase):
+
+    @override_settings(PARSE_WORKERS=1, PARSE_TIMEOUT=0.5, PARSE_DEADLINE=5)
+    def test_parser_started_after_last_completion_times_out(self):
+        quick, hanging = [
+            Restaurant.objects.create(name=name, provider='None', url='http://localhost/') for name in ('Quick', 'Slow')
+        ]
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def parse(r):
+            if r == hanging:
+                release.wait()
+            return [Meal(name='Soup', restaurant=r)]
+
+        with mock.patch.object(Commands, '_parse', side_effect=parse):
+            start = time.monotonic()
+            meals = Commands._parse_all([quick, hanging])
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(list(meals.keys()), [quick])
+        self.assertLess(elapsed, 2)
+        self.assertEqual(hanging.parse_attempts.get().error, 'Timed out')
+
+
+class PrefetchTest(TestCase):
+    """
+    Morning polls of a menu which is published late must not keep the lunch trigger from parsing it.
+    """
+
+    def test_late_menu_is_parsed_at_trigger(self):
+        restaurant = Restaurant.objects.create(name='Late Restaurant', provider='None', url='http://localhost/')
+        trigger = datetime.combine(datetime.now().date(), datetime.min.time()).replace(hour=11)
+        clock = [trigger.replace(hour=9, minute=30)]
+        polls = []
+
+        class Clock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock[0]
+
+        def sleep_until(moment):
+            clock[0] = max(clock[0], moment)
+
+        def parse(r):
+            polls.append(clock[0])
+            if clock[0] < trigger:
+                raise ValueError('Menu not published yet')
+            return [Meal(name='Soup', restaurant=r)]
+
+        with mock.patch.object(prefetch_menus, 'datetime', Clock), \
+                mock.patch.object(prefetch_menus.Command, '_sleep_until', side_effect=sleep_until), \
+                mock.patch.object(Commands, '_parse', side_effect=parse):
+            prefetch_menus.Command(stdout=io.StringIO())._poll(trigger, 300, 1800)
+            self.assertEqual(
+                [p.strftime('%H:%M') for p in polls], ['09:30', '09:35', '09:45', '10:05', '10:35', '10:55']
+            )
+
+            clock[0] = trigger
+            self.assertEqual(Commands.parse_missing_meals(Commands.all_restaurants()), [])
+
+        self.assertEqual([m.name for m in restaurant.meals.all()], ['Soup'])
+        self.assertEqual(restaurant.parse_attempts.count(), 1)
+
+    def test_successful_poll_ends_failure_streak(self):
+        restaurant = Restaurant.objects.create(name='Flaky Restaurant', provider='None', url='http://localhost/')
+        failing = mock.patch.object(Commands, '_parse', side_effect=ValueError('Menu not found'))
+        parsing = mock.patch.object(Commands, '_parse', side_effect=lambda r: [Meal(name='Soup', restaurant=r)])
+
+        with failing:
+            Commands.parse_meals([restaurant])
+            Commands.parse_missing_meals([restaurant], record_failures=False)
+        with parsing:
+            Commands.parse_missing_meals([restaurant], record_failures=False)
+        with failing:
+            Commands.parse_meals([restaurant])
+
+        self.assertEqual([a.failed for a in restaurant.parse_attempts.all()], [True, False, True])
+        self.assertEqual(len(health.consecutive_failures(restaurant)), 1)
+
+
+class _WeekMenuParser(AbstractParser):
+    URL = 'http://localhost/menu'
+    UNDATED_WEEK = True
+
+    def get_meals(self, restaurant: Restaurant):
+        return [self._build_meal(f'Soup of {day:%A}', None, restaurant, day) for day in self._week_dates()]
+
+
+class UndatedWeekTest(TestCase):
+    """
+    Weekly menus naming the days only must not fill the week with last week's meals.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache_dir = override_settings(PARSER_CACHE_DIR=directory)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+
+    def _parse(self, day: date, content: bytes) -> list:
+        with mock.patch.object(fetch, 'get', return_value=fetch.Page(_WeekMenuParser.URL, content)), \
+                mock.patch.object(AbstractParser, '_today', return_value=day):
+            return sorted(m.date for m in _WeekMenuParser().get_cached_meals(Restaurant(name='Weekly')))
+
+    def test_last_weeks_menu_is_kept_for_today_only(self):
+        last_monday, monday = date(2026, 10, 12), date(2026, 10, 19)
+        self.assertEqual(len(self._parse(last_monday, b'menu 42')), 5)
+
+        self.assertEqual(self._parse(monday, b'menu 42'), [monday])
+        self.assertEqual(self._parse(monday + timedelta(days=1), b'menu 42'), [monday + timedelta(days=1)])
+        self.assertEqual(len(self._parse(monday + timedelta(days=1), b'menu 43')), 5)
+        self.assertEqual(len(self._parse(monday + timedelta(days=2), b'menu 43')), 5)
@@ -4,11 +4,8 @@ from itertools import chain
 from lunchinator.commands import Commands
 from lunchinator.models import Selection, Meal, User, Restaurant
 from lunchinator import SlackUser
-from recommender.recommender import Recommender
 from slack_api.sender import SlackSender
 import re
-from django.http import HttpResponse
-import json
 
 from unidecode import unidecode
 
@@ -21,7 +18,7 @@ class TextCommands:
         self._re_some_digit = re.compile('[0-9]')
         self._re_meal = re.compile(r'([^\s0-9,]+)([0-9,]+)')
 
-    def lunch_cmd(self, slack_user: SlackUser, text: str, response_url: str):
+    def lunch_cmd(self, slack_user: SlackUser, text: str):
         if not text:
             return TextCommands._help()
 
@@ -40,8 +37,7 @@ class TextCommands:
         elif cmd == "erase":
             return self._erase_meals(slack_user, meal_groups=params)
         elif cmd == "create":
-            return ResponseWithAction({"response_type": "ephemeral", "text": "processing..."},
-                                      lambda: self._create_meal(slack_user, ' '.join(params), response_url))
+            return self._create_meal(slack_user, ' '.join(params))
         elif cmd == "search":
             return self._search_meals(slack_user, query=params)
         else:
@@ -77,21 +73,18 @@ class TextCommands:
                 selection.recommended = False
                 selection.save()
 
-            self._sender.post_selections(Commands.today_selections())
+            self._sender.post_selections_later(Commands.today_selections)
             return {"response_type": "ephemeral", "text": "voted"}
 
         else:
             blocks = []
-            if user:
-                user_meals_pks = {s.meal.pk for s in user.selections.filter(meal__date=date.today()).all()}
-            else:
-                user_meals_pks = None
+            user_meals_pks = user.today_meal_pks() if user else None
 
-            for restaurant_prefix in meal_groups:
-                restaurant = self._restaurant_by_prefix(restaurant_prefix)
+            restaurants = [self._restaurant_by_prefix(restaurant_prefix) for restaurant_prefix in meal_groups]
+            meals = SlackSender.today_meals([r for r in restaurants if r])
+            for restaurant_prefix, restaurant in zip(meal_groups, restaurants):
                 if restaurant:
-                    meals = restaurant.meals.filter(date=date.today()).all()
-                    blocks.extend(SlackSender.restaurant_meal_blocks(restaurant, meals, user_meals_pks))
+                    blocks.extend(SlackSender.restaurant_meal_blocks(restaurant, meals[restaurant], user_meals_pks))
                 else:
                     blocks.append(
                         {"type": "section", "text": {"type": "mrkdwn", "text": f"`{restaurant_prefix}` not found"}}
@@ -136,7 +129,7 @@ class TextCommands:
             selections = user.selections.filter(meal=meal)
             selections.delete()
 
-        self._sender.post_selections(Commands.today_selections())
+        self._sender.post_selections_later(Commands.today_selections)
         return {"response_type": "ephemeral", "text": "erased"}
 
     def _erase_restaurants(self, slack_user: SlackUser, text: str):
@@ -174,13 +167,12 @@ class TextCommands:
         }
 
     def _recommend_meals(self, slack_user: SlackUser, count: int):
+        from recommender.recommender import Recommender  # heavy (sklearn, majka), loaded on first use
+
         user = Commands.user(slack_user, allow_create=False)
         rec = Recommender(user)
 
-        if user:
-            user_meals_pks = {s.meal.pk for s in user.selections.filter(meal__date=date.today()).all()}
-        else:
-            user_meals_pks = None
+        user_meals_pks = user.today_meal_pks() if user else None
 
         text = "*Recommendations*"
         return {
@@ -189,37 +181,34 @@ class TextCommands:
             "blocks": SlackSender.recommendation_blocks(text, rec.get_recommendations(count), user_meals_pks)
         }
 
-    def _create_meal(self, slack_user: SlackUser, meal_name: str, response_url: str):
+    def _create_meal(self, slack_user: SlackUser, meal_name: str):
         user = Commands.user(slack_user)
         restaurant = \
             Restaurant.objects.get_or_create(name=Restaurant.ADHOC_NAME, provider='None', url='', enabled=False)[0]
         meal = Meal.objects.create(name=meal_name, price=None, restaurant=restaurant)
         Selection.objects.create(meal=meal, user=user, recommended=False)
 
-        self._sender.post_selections(Commands.today_selections())
-        for u in User.objects.filter(enabled=True).all():
-            self._sender.send_meals(u, [restaurant])
+        self._sender.post_selections_later(Commands.today_selections)
+        self._sender.send_meals_to_users(User.objects.filter(enabled=True).all(), [restaurant])
 
-        self._sender._api.send_response(response_url, {"response_type": "ephemeral", "text": "created and voted for"})
+        return {"response_type": "ephemeral", "text": "created and voted for"}
 
     @staticmethod
     def _search_meals(slack_user: SlackUser, query: str):
         user = Commands.user(slack_user)
-        if user:
-            user_meals_pks = {s.meal.pk for s in user.selections.filter(meal__date=date.today()).all()}
-        else:
-            user_meals_pks = None
+        user_meals_pks = user.today_meal_pks() if user else None
 
-        user_restaurants = user.all_favorite_restaurants()
+        user_restaurants = list(user.all_favorite_restaurants())
         other_restaurants = Restaurant.objects.exclude(id__in=[r.id for r in user_restaurants]).all()
 
         query_words = [unidecode(w).lower() for w in query]
 
         found_meals = {}
 
-        for rest in chain(user_restaurants, other_restaurants):
+        meals = SlackSender.today_meals(chain(user_restaurants, other_restaurants))
+        for rest, rest_meals in meals.items():
             res_meals = []
-            for meal in rest.meals.filter(date=date.today()).all():
+            for meal in rest_meals:
                 normalized_name = unidecode(meal.name).lower()
                 if any(w in normalized_name for w in query_words):
                     res_meals.append(meal)
@@ -273,24 +262,13 @@ class TextCommands:
             raise ValueError(f"`{match.group(1)}` not found")
 
         meals = []
-        all_meals = restaurant.meals.filter(date=date.today()).all()
+        all_meals = list(restaurant.meals.filter(date=date.today()))
         for index in match.group(2).split(','):
             if not index:
                 raise ValueError("Invalid syntax")
             idx = int(index) - 1
-            if 0 <= idx < len(all_meals):
+            if not 0 <= idx < len(all_meals):
                 raise ValueError("Index out of range")
             meals.append(all_meals[idx])
 
         return meals
-
-
-class ResponseWithAction(HttpResponse):
-
-    def __init__(self, resp, action):
-        super().__init__(json.dumps(resp), content_type="application/json")
-        self._action = action
-
-    def close(self):
-        super(ResponseWithAction, self).close()
-        self._action()
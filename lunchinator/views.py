@@ -7,9 +7,9 @@ from lunchinator.commands import Commands
 from lunchinator.text_commands import TextCommands
 from slack_api.sender import SlackSender
 from lunchinator.models import Restaurant, User
-from lunchinator import SlackUser
+from lunchinator import SlackUser, jobs
 import itertools
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 
 
 sender = SlackSender()
@@ -19,6 +19,7 @@ tcmd = TextCommands(sender)
 
 @csrf_exempt
 def endpoint(request: HttpRequest):
+    """Acknowledges the interaction at once, it is handled by a background job."""
     action = json.loads(request.POST["payload"])
     type = action["type"]
     user = SlackUser(action["user"]["id"], action["user"]["name"])
@@ -31,42 +32,26 @@ def endpoint(request: HttpRequest):
         actions = action["actions"]
 
         for action in actions:
-            action_id = action["action_id"]
-
-            if action_id == "recommend":
-                cmd.recommend_meals(user, 5)
-            elif action_id == "restaurants":
-                cmd.list_restaurants(user)
-            elif action_id == "invite_dialog":
-                sender.invite_dialog(trigger_id)
-            elif action_id == "print_selection":
-                cmd.print_selection(user)
-            elif action_id == "quit":
-                cmd.quit(user)
-
-            elif action_id.startswith("remove_restaurant"):
-                cmd.erase_restaurant(user, action["value"])
-            elif action_id.startswith("add_restaurant"):
-                cmd.select_restaurant(user, action["value"])
-            elif action_id.startswith("select_meal"):
-                cmd.select_meal(user, action["value"], recommended=False)
-            elif action_id.startswith("select_recommended_meal"):
-                cmd.select_meal(user, action["value"], recommended=True)
-            elif action_id.startswith("remove_meal"):
-                cmd.erase_meal(user, action["value"], recommended=False)
-            elif action_id.startswith("remove_recommended_meal"):
-                cmd.erase_meal(user, action["value"], recommended=True)
-
-            else:
-                print("unsupported action_id: " + action_id)
+            if _block_action(action["action_id"]) is None:
+                print("unsupported action_id: " + action["action_id"])
                 return HttpResponse(status=400)
 
+        for action in actions:
+            jobs.queue().submit(
+                'block_action',
+                user_id=user.user_id,
+                user_name=user.name,
+                action_id=action["action_id"],
+                value=action.get("value"),
+                trigger_id=trigger_id
+            )
+
     elif type == "dialog_submission":
         callback_id = action["callback_id"]
         submission = action["submission"]
 
         if callback_id == "user_selection":
-            sender.invite(submission["user"])
+            jobs.queue().submit('invite', user_id=submission["user"])
         else:
             print("unsupported callback id: " + callback_id)
             return HttpResponse(status=400)
@@ -78,27 +63,78 @@ def endpoint(request: HttpRequest):
     return HttpResponse()
 
 
+def _block_action(action_id: str) -> Optional[Callable[[SlackUser, str, str], None]]:
+    """:returns function handling the action with given id (called with user, value and trigger id),
+        None if the action is not supported.
+    """
+    if action_id == "recommend":
+        return lambda user, value, trigger_id: cmd.recommend_meals(user, 5)
+    elif action_id == "restaurants":
+        return lambda user, value, trigger_id: cmd.list_restaurants(user)
+    elif action_id == "invite_dialog":
+        return lambda user, value, trigger_id: sender.invite_dialog(trigger_id)
+    elif action_id == "print_selection":
+        return lambda user, value, trigger_id: cmd.print_selection(user)
+    elif action_id == "quit":
+        return lambda user, value, trigger_id: cmd.quit(user)
+    elif action_id == "toggle_digest":
+        return lambda user, value, trigger_id: cmd.toggle_digest(user)
+
+    elif action_id.startswith("digest_page"):
+        return lambda user, value, trigger_id: cmd.digest_page(user, value)
+
+    elif action_id.startswith("remove_restaurant"):
+        return lambda user, value, trigger_id: cmd.erase_restaurant(user, value)
+    elif action_id.startswith("add_restaurant"):
+        return lambda user, value, trigger_id: cmd.select_restaurant(user, value)
+    elif action_id.startswith("select_meal"):
+        return lambda user, value, trigger_id: cmd.select_meal(user, value, recommended=False)
+    elif action_id.startswith("select_recommended_meal"):
+        return lambda user, value, trigger_id: cmd.select_meal(user, value, recommended=True)
+    elif action_id.startswith("remove_meal"):
+        return lambda user, value, trigger_id: cmd.erase_meal(user, value, recommended=False)
+    elif action_id.startswith("remove_recommended_meal"):
+        return lambda user, value, trigger_id: cmd.erase_meal(user, value, recommended=True)
+
+    return None
+
+
+@jobs.handler('block_action')
+def _block_action_job(user_id: str, user_name: str, action_id: str, value: str, trigger_id: str):
+    _block_action(action_id)(SlackUser(user_id, user_name), value, trigger_id)
+
+
+@jobs.handler('invite')
+def _invite_job(user_id: str):
+    sender.invite(user_id)
+
+
 @csrf_exempt
 def slash(request: HttpRequest):
+    """Acknowledges the command at once, its response is posted to response_url by a background job."""
     user = SlackUser(request.POST["user_id"], request.POST["user_name"])
     command = request.POST["command"]
     text = request.POST["text"]
     response_url = request.POST["response_url"]
 
-    if command == "/lunch":
-        resp = tcmd.lunch_cmd(user, text, response_url)
-
-    elif command == "/lunchrest":
-        resp = tcmd.lunch_rest_cmd(user, text)
-
-    else:
+    if command not in ("/lunch", "/lunchrest"):
         print(f"unsupported slash command: {command}, user = {user}, text = {text}")
         return HttpResponse(status=400)
 
-    if isinstance(resp, HttpResponse):
-        return resp
+    jobs.queue().submit(
+        'slash', user_id=user.user_id, user_name=user.name, command=command, text=text, response_url=response_url
+    )
+    return HttpResponse()
+
+
+@jobs.handler('slash')
+def _slash_job(user_id: str, user_name: str, command: str, text: str, response_url: str):
+    user = SlackUser(user_id, user_name)
+    if command == "/lunch":
+        resp = tcmd.lunch_cmd(user, text)
     else:
-        return HttpResponse(json.dumps(resp), content_type="application/json")
+        resp = tcmd.lunch_rest_cmd(user, text)
+    sender.send_response(response_url, resp)
 
 
 @csrf_exempt
@@ -108,7 +144,7 @@ def trigger(request: HttpRequest):
         resp = cmd.parse_and_send_meals_for_restaurant(restaurant)
         return HttpResponse(bytes(resp, encoding='utf8'))
 
-    cmd.parse_and_send_meals()
+    cmd.parse_and_send_meals(reparse=request.GET.get('reparse', '').lower() == 'true')
     return HttpResponse()
 
 
@@ -62,7 +62,7 @@ class Recommender:
         not_selected_meals_df = self._transform_to_dataset(not_selected_meals, words_indecies, restaurants_indecies, 0)
         train_meals_df = np.concatenate((selected_meals_df, not_selected_meals_df))
 
-        todays_meals = Meal.objects.filter(date=date.today())
+        todays_meals = Meal.objects.filter(date=date.today()).select_related('restaurant')
         todays_meals_df = self._transform_to_dataset(todays_meals, words_indecies, restaurants_indecies)
 
         X, y = train_meals_df[:, :-1], train_meals_df[:, -1]
@@ -89,7 +89,7 @@ class Recommender:
         X = np.zeros((len(meals), len(words_indecies) + len(restaurants_indecies) + (1 if label is not None else 0)))
 
         for i, m in enumerate(meals):
-            r_idx = restaurants_indecies[m.restaurant.id]
+            r_idx = restaurants_indecies[m.restaurant_id]
             X[i, r_idx] = 1
             for w in self._process_meal_name(m.name):
                 w_idx = words_indecies[w]
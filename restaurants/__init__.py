@@ -1,30 +1,43 @@
-from restaurants.abstract_parser import FixedOfferParser
-from restaurants.prague import \
-    EmpiriaParser, ObederiaParser, NolaParser, CoolnaParser, PotrefenaHusaParser, \
-    CityTowerSodexoParser, DiCarloParser, EnterpriseParser, CorleoneParser, \
-    PankrackyRynekParser, PerfectCanteenParser, HarrysRestaurantParser, GlobusParser,\
-    PolygonParser, BramboryParser, CityCanteen
+from collections.abc import Mapping
+from importlib import import_module
 
 _PARSER_CLASSES = [
-    EmpiriaParser,
-    ObederiaParser,
-    NolaParser,
-    CoolnaParser,
-    PotrefenaHusaParser,
-    CityTowerSodexoParser,
-    DiCarloParser,
-    EnterpriseParser,
-    CorleoneParser,
-    PerfectCanteenParser,
-    HarrysRestaurantParser,
-    FixedOfferParser,
-    GlobusParser,
-    PolygonParser,
-    BramboryParser,
-    CityCanteen
+    'restaurants.prague.EmpiriaParser',
+    'restaurants.prague.ObederiaParser',
+    'restaurants.prague.NolaParser',
+    'restaurants.prague.CoolnaParser',
+    'restaurants.prague.PotrefenaHusaParser',
+    'restaurants.prague.CityTowerSodexoParser',
+    'restaurants.prague.DiCarloParser',
+    'restaurants.prague.EnterpriseParser',
+    'restaurants.prague.CorleoneParser',
+    'restaurants.prague.PerfectCanteenParser',
+    'restaurants.prague.HarrysRestaurantParser',
+    'restaurants.abstract_parser.FixedOfferParser',
+    'restaurants.prague.GlobusParser',
+    'restaurants.prague.PolygonParser',
+    'restaurants.prague.BramboryParser',
+    'restaurants.prague.CityCanteen'
 ]
 
-PARSERS = {
-    p.__name__: p
-    for p in _PARSER_CLASSES
-}
+
+class _LazyParsers(Mapping):
+    """
+    Parser classes by provider name, the module of a parser is imported only when the parser is first needed.
+    """
+
+    def __init__(self, paths: list):
+        self._paths = {p.rsplit('.', 1)[1]: p for p in paths}
+
+    def __getitem__(self, name: str):
+        module, class_name = self._paths[name].rsplit('.', 1)
+        return getattr(import_module(module), class_name)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+PARSERS = _LazyParsers(_PARSER_CLASSES)
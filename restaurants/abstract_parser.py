@@ -1,13 +1,27 @@
-import bs4
-from requests import get
+from datetime import date, timedelta
 
+import bs4
 
 from lunchinator.models import Meal, Restaurant
+from restaurants import fetch
+from restaurants.cache import DiskCache
+
+try:
+    import lxml  # noqa: F401
+    SOUP_FEATURES = 'lxml'
+except ImportError:
+    SOUP_FEATURES = 'html.parser'
+
+_MEALS = DiskCache('meals', ttl=24 * 3600)
+_WEEK_MENUS = DiskCache('week-menus', ttl=14 * 24 * 3600)  # Monday of the week an undated menu was first seen in
 
 
 class AbstractParser:
     URL = None
     ENCODING = 'UTF-8'
+    PARSE_ONLY = None  # (tag name, attrs) of the page region the parser reads, only those subtrees are built
+    CPU_BOUND = False  # parsed in a separate worker process, see lunchinator.isolation
+    UNDATED_WEEK = False  # the weekly menu names the days but not their dates, see _this_weeks_meals
     HEADERS = {
         'accept-language': 'en-GB,en-US;q=0.9,en;q=0.8',
         'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/77.0.3814.0 Safari/537.36',
@@ -32,17 +46,77 @@ class AbstractParser:
         """
         raise NotImplementedError
 
+    def get_cached_meals(self, restaurant: Restaurant):
+        """Parses meals like get_meals, unless meals were already parsed today from an identical page.
+
+            :returns list of meals (not saved to db yet).
+        """
+        if not self.URL:
+            return self.get_meals(restaurant)
+
+        with fetch.run():
+            page = fetch.get(self.URL, headers=self.HEADERS)
+            key = f'{type(self).__name__}:{page.digest}:{self._today()}'
+            cached = _MEALS.get_json(key)
+            if cached is not None:
+                return [
+                    self._build_meal(name, price, restaurant, date.fromisoformat(meal_date))
+                    for name, price, meal_date in cached
+                ]
+
+            meals = self.get_meals(restaurant)
+            if meals is not None and self.UNDATED_WEEK:
+                meals = self._this_weeks_meals(meals, page.digest)
+            if meals is not None:
+                _MEALS.set_json(key, [(m.name, m.price, m.date.isoformat()) for m in meals])
+            return meals
+
     def _get_text(self):
-        req = get(self.URL, headers=self.HEADERS)
-        req.encoding = self.ENCODING
-        return req.text
+        return fetch.get(self.URL, headers=self.HEADERS).text(self.ENCODING)
 
     def _get_soup(self):
-        html = self._get_text()
-        return bs4.BeautifulSoup(html, features="html.parser")
+        return self._make_soup(self._get_text())
+
+    def _make_soup(self, html: str):
+        if self.PARSE_ONLY:
+            name, attrs = self.PARSE_ONLY
+            parse_only = bs4.SoupStrainer(name, {k: AbstractParser._token_matcher(v) for k, v in attrs.items()})
+        else:
+            parse_only = None
+        return bs4.BeautifulSoup(html, features=SOUP_FEATURES, parse_only=parse_only)
+
+    @staticmethod
+    def _token_matcher(token: str):
+        # while parsing, multi-valued attributes like class are not split yet
+        return lambda value: value is not None and token in (value if isinstance(value, list) else value.split())
+
+    def _build_meal(self, name, price, restaurant: Restaurant, meal_date: date = None):
+        return Meal(name=name, price=price, restaurant=restaurant, date=meal_date or self._today())
 
-    def _build_meal(self, name, price, restaurant: Restaurant):
-        return Meal(name=name, price=price, restaurant=restaurant)
+    @staticmethod
+    def _today() -> date:
+        return fetch.today()
+
+    def _week_dates(self) -> list:
+        """Dates of the working days (matching WEEK_DAYS_CZ) of the current week."""
+        monday = self._today() - timedelta(days=self._today().weekday())
+        return [monday + timedelta(days=i) for i in range(len(self.WEEK_DAYS_CZ))]
+
+    def _this_weeks_meals(self, meals: list, digest: str) -> list:
+        """Keeps meals of all days of an undated weekly menu only if the page was first seen this week.
+
+            Otherwise it may be last week's menu still online, so only today's meals are kept and the following
+            days are parsed again. The same applies when it cannot be told, with the parser cache disabled.
+        """
+        monday = self._week_dates()[0].isoformat()
+        key = f'{type(self).__name__}:{digest}'
+        first_seen = _WEEK_MENUS.get_json(key)
+        if first_seen is None and _WEEK_MENUS.enabled:
+            _WEEK_MENUS.set_json(key, monday)
+            first_seen = monday
+        if first_seen == monday:
+            return meals
+        return [m for m in meals if m.date == self._today()]
 
 
 class FixedOfferParser(AbstractParser):
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+from django.conf import settings
+
+_caches = []
+
+
+class DiskCache:
+    """
+    Small on-disk key-value cache (one file per key) shared by the parsers and by all processes.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None):
+        self._name = name
+        self._ttl = ttl
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        _caches.append(self)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.PARSER_CACHE_DIR)
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if self._ttl is not None and os.path.getmtime(path) + self._ttl < time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def touch(self, key: str):
+        """Restarts the TTL of the cached value."""
+        if not self.enabled:
+            return
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes]) -> bytes:
+        """Returns the cached value, or computes and caches it, counting hits, misses and compute time."""
+        value = self.get(key)
+        if value is not None:
+            with self._stats_lock:
+                self._hits += 1
+            return value
+
+        start = time.monotonic()
+        value = compute()
+        with self._stats_lock:
+            self._misses += 1
+            self._compute_time += time.monotonic() - start
+        self.set(key, value)
+        return value
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return None if value is None else json.loads(value.decode('utf-8'))
+
+    def set_json(self, key: str, value):
+        self.set(key, json.dumps(value).encode('utf-8'))
+
+    def stats(self, reset: bool = False) -> str:
+        with self._stats_lock:
+            stats = f'{self._name}: {self._hits} hits, {self._misses} misses, {self._compute_time:.1f} s computing'
+            if reset:
+                self._reset_stats()
+        return stats
+
+    def counts(self) -> tuple:
+        """:returns hits, misses and seconds spent computing."""
+        with self._stats_lock:
+            return self._hits, self._misses, self._compute_time
+
+    def add_counts(self, hits: int, misses: int, compute_time: float):
+        with self._stats_lock:
+            self._hits += hits
+            self._misses += misses
+            self._compute_time += compute_time
+
+    def _reset_stats(self):
+        self._hits = 0
+        self._misses = 0
+        self._compute_time = 0.0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(settings.PARSER_CACHE_DIR, self._name, digest[:2], digest)
+
+
+def report() -> list:
+    """Returns and resets the statistics of caches used since the last report."""
+    return [c.stats(reset=True) for c in _caches if c._hits or c._misses]
+
+
+def counts() -> dict:
+    """Returns the counts of caches used in this process by name, to be merged into another one's, see merge."""
+    return {c._name: c.counts() for c in _caches if c._hits or c._misses}
+
+
+def merge(counts: dict):
+    """Adds counts of caches used in another process (e.g. a parser worker) to the caches of this one."""
+    caches = {c._name: c for c in _caches}
+    for name, (hits, misses, compute_time) in counts.items():
+        if name not in caches:
+            caches[name] = DiskCache(name)
+        caches[name].add_counts(hits, misses, compute_time)
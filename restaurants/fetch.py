@@ -0,0 +1,194 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from restaurants.cache import DiskCache
+
+
+@dataclass
+class Page:
+    url: str
+    content: bytes
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()
+
+    def text(self, encoding: str) -> str:
+        return str(self.content, encoding, errors='replace')
+
+
+class _Fixtures:
+    """
+    Directory of recorded downloads with an index of URLs and the day they were recorded on.
+    """
+    INDEX = 'index.json'
+
+    def __init__(self, mode: str, directory: str):
+        assert mode in ('record', 'replay'), f'Unknown fixtures mode {mode}'
+        self.replaying = mode == 'replay'
+        self._directory = directory
+        self._lock = threading.Lock()
+
+        if self.replaying:
+            with open(os.path.join(directory, self.INDEX)) as f:
+                self._index = json.load(f)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._index = {'date': date.today().isoformat(), 'pages': {}}
+
+    @property
+    def date(self) -> date:
+        return date.fromisoformat(self._index['date'])
+
+    def load(self, url: str) -> Page:
+        if url not in self._index['pages']:
+            raise LookupError(f'No fixture recorded for {url}')
+        with open(os.path.join(self._directory, self._index['pages'][url]), 'rb') as f:
+            return Page(url, f.read())
+
+    def save(self, page: Page):
+        file_name = hashlib.sha256(page.url.encode('utf-8')).hexdigest()[:16] + '.bin'
+        with open(os.path.join(self._directory, file_name), 'wb') as f:
+            f.write(page.content)
+        with self._lock:
+            self._index['pages'][page.url] = file_name
+            with open(os.path.join(self._directory, self.INDEX), 'w') as f:
+                json.dump(self._index, f, indent=2, sort_keys=True)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_PAGES = DiskCache('pages', ttl=settings.PARSER_CACHE_TTL)
+
+_run_pages = None
+_run_depth = 0
+_run_lock = threading.Lock()
+_url_locks = {}
+
+_fixtures = _Fixtures(settings.PARSER_FIXTURES_MODE, settings.PARSER_FIXTURES_DIR) \
+    if settings.PARSER_FIXTURES_MODE else None
+
+
+def session(url: str) -> requests.Session:
+    """Returns the shared keep-alive session for the host of given URL."""
+    parts = urlsplit(url)
+    host = (parts.scheme, parts.netloc)
+    with _sessions_lock:
+        if host not in _sessions:
+            _sessions[host] = _new_session()
+        return _sessions[host]
+
+
+@contextmanager
+def run():
+    """Within a run, each URL is downloaded at most once, concurrent fetches of the same URL share the result."""
+    global _run_pages, _run_depth
+    with _run_lock:
+        if _run_depth == 0:
+            _run_pages = {}
+        _run_depth += 1
+    try:
+        yield
+    finally:
+        with _run_lock:
+            _run_depth -= 1
+            if _run_depth == 0:
+                _run_pages = None
+                _url_locks.clear()
+
+
+@contextmanager
+def fixtures(mode: str, directory: str):
+    """Records all downloads into directory ('record'), or serves them from it without network access ('replay')."""
+    global _fixtures
+    previous = _fixtures
+    _fixtures = _Fixtures(mode, directory)
+    try:
+        yield
+    finally:
+        _fixtures = previous
+
+
+def today() -> date:
+    """The day the replayed fixtures were recorded on, today otherwise."""
+    if _fixtures is not None and _fixtures.replaying:
+        return _fixtures.date
+    return date.today()
+
+
+def get(url: str, headers: dict = None) -> Page:
+    """Downloads given URL, revalidating the cached copy by ETag/Last-Modified if there is one."""
+    with _run_lock:
+        pages = _run_pages
+        url_lock = _url_locks.setdefault(url, threading.Lock()) if pages is not None else None
+
+    if pages is None:
+        return _download(url, headers)
+
+    with url_lock:
+        if url not in pages:
+            pages[url] = _download(url, headers)
+        return pages[url]
+
+
+def _download(url: str, headers: dict = None) -> Page:
+    if _fixtures is not None and _fixtures.replaying:
+        return _fixtures.load(url)
+
+    page = _conditional_get(url, headers)
+    if _fixtures is not None:
+        _fixtures.save(page)
+    return page
+
+
+def _conditional_get(url: str, headers: dict = None) -> Page:
+    request_headers = dict(headers or {})
+    cached = _PAGES.get_json(url)
+    if cached:
+        if cached['etag']:
+            request_headers['if-none-match'] = cached['etag']
+        if cached['last_modified']:
+            request_headers['if-modified-since'] = cached['last_modified']
+
+    response = session(url).get(url, headers=request_headers, timeout=settings.PARSER_HTTP_TIMEOUT)
+    if cached and response.status_code == 304:
+        _PAGES.touch(url)  # just revalidated, so valid for another TTL
+        return Page(url, base64.b64decode(cached['content']))
+    response.raise_for_status()
+
+    _PAGES.set_json(url, {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'content': base64.b64encode(response.content).decode('ascii')
+    })
+    return Page(url, response.content)
+
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=settings.PARSER_HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504)
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.PARSER_HTTP_POOL_SIZE,
+        max_retries=retry
+    )
+    s = requests.Session()
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    return s
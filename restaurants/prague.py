@@ -1,19 +1,10 @@
 import re
-from datetime import datetime
 from io import BytesIO
 
-from pytesseract import pytesseract
-
 from lunchinator.models import Restaurant
 from restaurants.abstract_parser import AbstractParser
-
-from contextlib import contextmanager
-import tempfile
-import requests
-
-from pdfminer.high_level import extract_text_to_fp
-
-from PIL import Image
+from restaurants import fetch
+from restaurants.cache import DiskCache
 
 from unidecode import unidecode
 import html
@@ -21,6 +12,7 @@ import html
 
 class MenickaAbstractParser(AbstractParser):
     ENCODING = 'WINDOWS-1250'
+    PARSE_ONLY = 'div', {'class': 'menicka'}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -64,6 +56,7 @@ class PotrefenaHusaParser(MenickaAbstractParser):
 
 class CityTowerSodexoParser(AbstractParser):
     URL = 'http://citytower.portal.sodexo.cz/cs/uvod'
+    PARSE_ONLY = 'table', {}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -80,6 +73,7 @@ class CityTowerSodexoParser(AbstractParser):
 
 class DiCarloParser(AbstractParser):
     URL = 'https://www.dicarlo.cz/pankrac/'
+    PARSE_ONLY = 'div', {'class': 'daily-menu-section__table'}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -99,6 +93,7 @@ class DiCarloParser(AbstractParser):
 
 class EnterpriseParser(AbstractParser):
     URL = 'https://www.prague-catering.cz/provozovny/Enterprise-kantyna/Denni-menu-Enterprise/'
+    PARSE_ONLY = 'tr', {}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -137,36 +132,36 @@ class EnterpriseParser(AbstractParser):
 
 class CorleoneParser(AbstractParser):
     URL = 'https://www.corleone.cz/pizzeria-arkady/tydenni-nabidka'
+    PARSE_ONLY = 'table', {}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
-        today = datetime.today()
-        date = f'{today.day}.{today.month}.'
 
         meals = []
 
-        day_tr = soup.find('th', text=lambda s: date in s).parent
-        meal_tr = day_tr.find_next_sibling()
-        while meal_tr and meal_tr.get('class')[0] != 'date':
-            name_td, price_td = meal_tr.find_all('td')
-            name = name_td.text
-            price = float(price_td.find('u').text)
-            meals.append(self._build_meal(name, price, restaurant))
-            meal_tr = meal_tr.find_next_sibling()
-        return meals
-
+        for day in self._week_dates():
+            date = f'{day.day}.{day.month}.'
+            day_th = soup.find('th', text=lambda s: s is not None and date in s)
+            if day_th is None:
+                continue
 
-@contextmanager
-def open_url(url):
-    with tempfile.NamedTemporaryFile() as tfile:
-        tfile.write(requests.get(url).content)
-        tfile.flush()
-        tfile.seek(0)
-        yield tfile
+            meal_tr = day_th.parent.find_next_sibling()
+            while meal_tr and meal_tr.get('class')[0] != 'date':
+                name_td, price_td = meal_tr.find_all('td')
+                name = name_td.text
+                price = float(price_td.find('u').text)
+                meals.append(self._build_meal(name, price, restaurant, day))
+                meal_tr = meal_tr.find_next_sibling()
+        return meals
 
 
 class PerfectCanteenParser(AbstractParser):
     URL = 'http://menu.perfectcanteen.cz/pdf/27/cz/price/a3'
+    CPU_BOUND = True
+    UNDATED_WEEK = True
+    MENU_PAGES = [0]  # the A3 menu has both daily and weekly sections on its first page
+
+    TEXT_CACHE = DiskCache('pdf-text', ttl=7 * 24 * 3600)  # keyed by digest of the menu PDF
 
     WEEKLY_MENU_SECTIONS = [
         'PASTA FRESCA BAR',
@@ -176,10 +171,16 @@ class PerfectCanteenParser(AbstractParser):
     ]
 
     def _get_text(self):
-        with open_url(self.URL) as menu_pdf, tempfile.NamedTemporaryFile() as out:
-            extract_text_to_fp(menu_pdf, out)
-            out.seek(0)
-            return list(out)[0].decode('utf-8')
+        menu_pdf = fetch.get(self.URL)
+        text = self.TEXT_CACHE.get_or_compute(menu_pdf.digest, lambda: self._extract_text(menu_pdf.content))
+        return text.decode('utf-8').split('\n', 1)[0]
+
+    def _extract_text(self, pdf: bytes) -> bytes:
+        from pdfminer.high_level import extract_text_to_fp  # imported only in the worker process (CPU_BOUND)
+
+        out = BytesIO()
+        extract_text_to_fp(BytesIO(pdf), out, page_numbers=self.MENU_PAGES)
+        return out.getvalue()
 
     @staticmethod
     def _extract_meal_and_price(s):
@@ -188,26 +189,32 @@ class PerfectCanteenParser(AbstractParser):
         name = re.search('(.+) {2}.*', name).group(1).strip()  # remove allergens
         return name, float(price)
 
-    def _extract_meals_from_section(self, s, restaurant: Restaurant):
+    def _extract_meals_from_section(self, s, restaurant: Restaurant, day):
         meals = []
         for m in re.findall('(.*? [0-9]+) Kč', s):
             name, price = self._extract_meal_and_price(m)
-            meals.append(self._build_meal(name, price, restaurant))
+            meals.append(self._build_meal(name, price, restaurant, day))
         return meals
 
-    def _extract_todays_menu(self, s, restaurant: Restaurant):
-        week_day = self.WEEK_DAYS_CZ[datetime.today().weekday()]
-        todays_menu = re.search(f'{week_day}(.*)TÝDENNÍ NABÍDKA', s).group(1).split('Každý den')[0]
-        return self._extract_meals_from_section(todays_menu, restaurant)
+    def _extract_daily_menus(self, s, restaurant: Restaurant):
+        meals = {}
+        for i, (week_day, day) in enumerate(zip(self.WEEK_DAYS_CZ, self._week_dates())):
+            section_end = '|'.join(self.WEEK_DAYS_CZ[i + 1:] + ['TÝDENNÍ NABÍDKA'])
+            daily_menu = re.search(f'{week_day}(.*?)(?:{section_end})', s)
+            if daily_menu:
+                meals[day] = self._extract_meals_from_section(
+                    daily_menu.group(1).split('Každý den')[0], restaurant, day
+                )
+        return meals
 
-    def _extract_weekly_menu(self, s, restaurant: Restaurant):
+    def _extract_weekly_menu(self, s, restaurant: Restaurant, day):
         meals = []
 
         weekly_menu = re.search('TÝDENNÍ NABÍDKA(.*PŘÍLOHY)', s).group(1)
         for start, end in zip(self.WEEKLY_MENU_SECTIONS, self.WEEKLY_MENU_SECTIONS[1:]):
             try:
                 section_meals = re.search(f'{start} *(.*){end}', weekly_menu).group(1)
-                meals.extend(self._extract_meals_from_section(section_meals, restaurant))
+                meals.extend(self._extract_meals_from_section(section_meals, restaurant, day))
             except AttributeError:
                 pass
         return meals
@@ -215,23 +222,27 @@ class PerfectCanteenParser(AbstractParser):
     def get_meals(self, restaurant: Restaurant):
         text = self._get_text()
         meals = []
-        meals.extend(self._extract_todays_menu(text, restaurant))
-        meals.extend(self._extract_weekly_menu(text, restaurant))
+        for day, daily_meals in self._extract_daily_menus(text, restaurant).items():
+            meals.extend(daily_meals)
+            meals.extend(self._extract_weekly_menu(text, restaurant, day))
         return meals
 
 
 class HarrysRestaurantParser(AbstractParser):
     URL = 'http://www.harrysrestaurant.cz/poledni-menu'
+    PARSE_ONLY = 'h4', {}
+    CPU_BOUND = True
+    UNDATED_WEEK = True
+
+    OCR_CACHE = DiskCache('ocr', ttl=7 * 24 * 3600)  # keyed by digest of the menu image
 
-    def _get_specialty(self, menu, restaurant: Restaurant):
+    def _get_specialty(self, menu, restaurant: Restaurant, day):
         spec_idx = menu.index('Specialita šéfkuchaře pondělí — pátek')
         pond_inx = menu.index('Pondělí')
 
-        return self._build_meal(' '.join(menu[spec_idx + 1:pond_inx]), None, restaurant)
-
-    def _get_todays_menu(self, menu, restaurant: Restaurant):
-        week_day_n = datetime.today().weekday()
+        return self._build_meal(' '.join(menu[spec_idx + 1:pond_inx]), None, restaurant, day)
 
+    def _get_day_menu(self, menu, week_day_n, restaurant: Restaurant, day):
         decoded_menu = list(map(unidecode, menu))
         decoded_weekdays = list(map(unidecode, self.WEEK_DAYS_CZ))
 
@@ -247,16 +258,16 @@ class HarrysRestaurantParser(AbstractParser):
             # Everybody's lookin' forward to the weekend, weekend
             end_idx = -1
 
-        today_menu = menu[start_idx:end_idx]
+        day_menu = menu[start_idx:end_idx]
 
         meals = []
 
         meal_parts = []
-        for meal_part in today_menu:
+        for meal_part in day_menu:
             if meal_part.endswith('-'):
                 *meal_part, price = meal_part.rsplit(' ', 1)  # meal_part might be empty if price is on a new line
                 meal_parts.extend(meal_part)
-                meals.append(self._build_meal(' '.join(meal_parts), int(price.split(',')[0]), restaurant))
+                meals.append(self._build_meal(' '.join(meal_parts), int(price.split(',')[0]), restaurant, day))
                 meal_parts = []
             else:
                 meal_parts.append(meal_part)
@@ -266,14 +277,24 @@ class HarrysRestaurantParser(AbstractParser):
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
         menu_img_url = soup.find('h4').find('img')['src']
-        response = requests.get(menu_img_url)
-        img = Image.open(BytesIO(response.content))
-        menu_text = pytesseract.image_to_string(img, lang='ces')
+        image = fetch.get(menu_img_url)
+        from PIL import Image  # imported only in the worker process (CPU_BOUND)
+        from pytesseract import pytesseract
+        menu_text = self.OCR_CACHE.get_or_compute(
+            image.digest,
+            lambda: pytesseract.image_to_string(Image.open(BytesIO(image.content)), lang='ces').encode('utf-8')
+        ).decode('utf-8')
 
         menu = re.compile(r"([^\s].*)", re.MULTILINE).findall(menu_text)
 
-        meals = [self._get_specialty(menu, restaurant)]
-        meals.extend(self._get_todays_menu(menu, restaurant))
+        meals = []
+        for week_day_n, day in enumerate(self._week_dates()):
+            try:
+                day_meals = self._get_day_menu(menu, week_day_n, restaurant, day)
+            except ValueError:
+                continue  # day not found in the menu
+            meals.append(self._get_specialty(menu, restaurant, day))
+            meals.extend(day_meals)
 
         return meals
 
@@ -287,6 +308,7 @@ class PankrackyRynekParser(AbstractParser):
 
 class GlobusParser(AbstractParser):
     URL = 'https://www.globus.cz/freshpankrac.html'
+    PARSE_ONLY = 'div', {'class': 'FreshPage-menuItem--green'}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -310,17 +332,20 @@ class GlobusParser(AbstractParser):
 
 class PolygonParser(AbstractParser):
     URL = 'http://www.polygon-canteen.cz/'
+    PARSE_ONLY = 'li', {'id': 'page_obedy'}
+    UNDATED_WEEK = True
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
         obedy = soup.find('li', {'id': 'page_obedy'})
         meals = []
-        week_day = self.WEEK_DAYS_CZ[datetime.today().weekday()]
-        started = False
+        week_days = dict(zip(self.WEEK_DAYS_CZ, self._week_dates()))
+        day = None
         for tr in obedy.find_all('tr'):
-            if started:
-                if any(wd in tr.text for wd in self.WEEK_DAYS_CZ):
-                    break
+            week_day = next((wd for wd in self.WEEK_DAYS_CZ if wd in tr.text), None)
+            if week_day:
+                day = week_days[week_day]
+            elif day:
                 tds = tr.find_all('td')
                 if len(tds) >= 4 and tds[1].text.strip() and tds[0].text.strip():
                     name = tds[1].text.strip()
@@ -329,16 +354,14 @@ class PolygonParser(AbstractParser):
                     except (ValueError, IndexError):
                         price = None
 
-                    meals.append(self._build_meal(name, price, restaurant))
-            else:
-                if week_day in tr.text:
-                    started = True
+                    meals.append(self._build_meal(name, price, restaurant, day))
 
         return meals
 
 
 class BramboryParser(AbstractParser):
     URL = 'https://www.bramborynapankraci.cz/'
+    PARSE_ONLY = 'div', {'class': 'denninabidka'}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
@@ -356,11 +379,12 @@ class BramboryParser(AbstractParser):
 
 class CityCanteen(AbstractParser):
     URL = 'https://www.freshandtasty.cz/cz/firmy/city-canteen/menu/obedy'
+    PARSE_ONLY = 'section', {'class': 'whole-menu'}
 
     def get_meals(self, restaurant: Restaurant):
         soup = self._get_soup()
         menu = soup.find('section', {'class': 'whole-menu'})
-        today = datetime.today().strftime(' %-d. %-m.')
+        today = self._today().strftime(' %-d. %-m.')
         meals = []
         for h in menu.find_all('h2', {'class': 'meal__header'}):
             if today in h.text:
@@ -0,0 +1,88 @@
+import asyncio
+import atexit
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+from django.conf import settings
+
+
+class EventLoop:
+    """
+    Event loop running in a background thread, with an HTTP session shared by the coroutines run in it.
+    At most SLACK_ASYNC_CONCURRENCY of them run at once, the rest wait for their turn.
+    """
+
+    def __init__(self, concurrency: int, timeout: float):
+        self._concurrency = concurrency
+        self._timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+
+    def submit(self, coroutine: Callable[[aiohttp.ClientSession], Awaitable]) -> Future:
+        """Runs coroutine(session) in the loop.
+
+            :returns future of its result, failures are printed unless somebody waits for them.
+        """
+        loop = self._start()
+
+        async def run():
+            async with self._slots:
+                return await coroutine(self._session)
+
+        future = asyncio.run_coroutine_threadsafe(run(), loop)
+        future.add_done_callback(EventLoop._report)
+        return future
+
+    def post_json(self, url: str, body: dict) -> Future:
+        async def post(session: aiohttp.ClientSession):
+            async with session.post(url, json=body) as resp:
+                if resp.status != 200:
+                    raise AssertionError("Unexpected response code: " + str(resp.status))
+
+        return self.submit(post)
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(timeout=self._timeout)
+        loop.call_soon_threadsafe(loop.stop)
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='slack-aio', daemon=True).start()
+                asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _setup(self):
+        self._slots = asyncio.Semaphore(self._concurrency)
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self._timeout),
+            connector=aiohttp.TCPConnector(limit=self._concurrency)
+        )
+
+    @staticmethod
+    def _report(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            ex = future.exception()
+            print("Failed running Slack call in the event loop")
+            print(ex)
+            traceback.print_exception(type(ex), ex, ex.__traceback__)
+
+
+_loop = EventLoop(settings.SLACK_ASYNC_CONCURRENCY, settings.SLACK_TIMEOUT)
+atexit.register(_loop.close)
+
+
+def loop() -> EventLoop:
+    """The event loop shared by all Slack calls of the process."""
+    return _loop
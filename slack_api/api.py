@@ -1,7 +1,15 @@
 import os
-import slack
-import aiohttp
-import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from slack.errors import SlackApiError
+from django.conf import settings
+
+from slack_api import aio
+from slack_api.client import PooledWebClient
+from slack_api.rate_limit import RateLimiter
 
 
 class SlackApi:
@@ -9,19 +17,29 @@ class SlackApi:
     Low-level API wrapping Slack API.
     """
 
-    def __init__(self):
-        self._user_channels = {}
-        self._client = lambda: slack.WebClient(token=os.environ['LUNCHINATOR_TOKEN'])
+    def __init__(self, channels: Callable[[], dict] = None, on_channel_open: Callable[[str, str], None] = None):
+        """
+        :param channels: loads the known DM channels (user id -> channel id), called once on first use.
+        :param on_channel_open: called with user id and channel id of each newly opened DM channel.
+        """
+        self._user_channels = None
+        self._channels = channels or dict
+        self._on_channel_open = on_channel_open
+        self._channels_lock = threading.Lock()
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._call_hooks = []
+        self._rate_limiter = RateLimiter()
+        self._retries_lock = threading.Lock()
+        self.retries = 0
 
     def message(self, channel: str, text: str, blocks: list = None) -> str:
-        response = self._client().chat_postMessage(text=SlackApi._encode(text), channel=channel, blocks=blocks)
-        assert response["ok"]
+        response = self._call('chat_postMessage', text=SlackApi._encode(text), channel=channel, blocks=blocks)
         return response["ts"]
 
     def update_message(self, channel: str, ts: str, text: str, blocks: list = None) -> str:
         try:
-            response = self._client().chat_update(text=SlackApi._encode(text), channel=channel, blocks=blocks, ts=ts)
-            assert response["ok"]
+            self._call('chat_update', text=SlackApi._encode(text), channel=channel, blocks=blocks, ts=ts)
             return ts
         except:
             print(f"Failed to update message {ts} for {channel}, sending as new")
@@ -29,13 +47,12 @@ class SlackApi:
 
     def delete_message(self, channel: str, ts: str):
         try:
-            response = self._client().chat_delete(channel=channel, ts=ts)
-            assert response["ok"]
+            self._call('chat_delete', channel=channel, ts=ts)
         except:
             print(f"Failed to delete message {ts} for {channel}")
 
     def user_dialog(self, trigger_id: str):
-        self._client().dialog_open(dialog={
+        self._call('dialog_open', dialog={
             "callback_id": "user_selection",
             "title": "Select user",
             "submit_label": "Select",
@@ -47,27 +64,64 @@ class SlackApi:
             }]}, trigger_id=trigger_id)
 
     def user_channel(self, userid: str) -> str:
-        if userid in self._user_channels:
-            return self._user_channels[userid]
-        else:
-            response = self._client().conversations_open(users=userid)
-            assert response["ok"]
-            self._user_channels[userid] = response["channel"]["id"]
-            return response["channel"]["id"]
-
-    def send_response(self, response_url: str, response: dict):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        async def post():
-            async with aiohttp.ClientSession(
-                loop=loop, timeout=aiohttp.ClientTimeout(total=30)
-            ) as session:
-                async with session.request("POST", response_url, json=response) as resp:
-                    if resp.status != 200:
-                        raise AssertionError("Unexpected response code: " + str(resp.status))
-
-        loop.run_until_complete(asyncio.ensure_future(post()))
+        with self._channels_lock:
+            if self._user_channels is None:
+                self._user_channels = dict(self._channels())
+            if userid in self._user_channels:
+                return self._user_channels[userid]
+
+        response = self._call('conversations_open', users=userid)
+        channel = response["channel"]["id"]
+        with self._channels_lock:
+            self._user_channels[userid] = channel
+        if self._on_channel_open is not None:
+            self._on_channel_open(userid, channel)
+        return channel
+
+    def send_response(self, response_url: str, response: dict) -> Future:
+        """Posts the response to response_url in the background.
+
+            :returns future of the post.
+        """
+        return aio.loop().post_json(response_url, response)
+
+    def add_call_hook(self, hook: Callable[[str, float, Optional[int]], None]):
+        """Registers hook called after each Web API request with the method, its latency and HTTP status."""
+        self._call_hooks.append(hook)
+
+    def remove_call_hook(self, hook: Callable[[str, float, Optional[int]], None]):
+        self._call_hooks.remove(hook)
+
+    def client(self) -> PooledWebClient:
+        """The client shared by all calls, created on first use."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = PooledWebClient(token=os.environ['LUNCHINATOR_TOKEN'])
+            return self._client
+
+    def _call(self, method: str, **kwargs):
+        """Calls the Web API method within its rate limit, retrying rate limited calls after their Retry-After."""
+        for attempt in range(settings.SLACK_MAX_RETRIES + 1):
+            self._rate_limiter.acquire(method, kwargs.get('channel'))
+            start = time.monotonic()
+            status = None
+            try:
+                response = getattr(self.client(), method)(**kwargs)
+                status = response.status_code
+                assert response["ok"]
+                return response
+            except SlackApiError as e:
+                status = e.response.status_code
+                if e.response.status_code != 429 or attempt == settings.SLACK_MAX_RETRIES:
+                    raise
+                retry_after = float(e.response.headers.get('Retry-After', 1))
+                print(f"Rate limited calling {method}, retrying in {retry_after} s")
+                self._rate_limiter.pause(method, kwargs.get('channel'), retry_after)
+                with self._retries_lock:
+                    self.retries += 1
+            finally:
+                for hook in list(self._call_hooks):
+                    hook(method, time.monotonic() - start, status)
 
     @staticmethod
     def _encode(s: str) -> str:
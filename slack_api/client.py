@@ -0,0 +1,44 @@
+import requests
+import slack
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PooledWebClient(slack.WebClient):
+    """
+    WebClient sending its requests through a keep-alive connection pool instead of opening a connection per call.
+
+    Only failures to connect are retried, a Web API call may have taken effect once its request was sent.
+    Rate limited calls are retried by SlackApi.
+    """
+
+    def __init__(self, token: str):
+        super().__init__(token=token, base_url=settings.SLACK_API_URL, timeout=settings.SLACK_TIMEOUT)
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.SLACK_POOL_SIZE,
+            max_retries=Retry(total=None, connect=settings.SLACK_CONNECT_RETRIES, read=0, status=0,
+                              backoff_factor=0.5)
+        )
+        self._session = requests.Session()
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def _perform_urllib_http_request(self, *, url: str, args: dict) -> dict:
+        if args['data']:
+            return super()._perform_urllib_http_request(url=url, args=args)  # multipart file uploads
+
+        headers = dict(args['headers'])
+        if args['json']:
+            response = self._session.post(url, json=args['json'], headers=headers, timeout=self.timeout)
+        else:
+            response = self._session.post(url, data=args['params'] or None, headers=headers, timeout=self.timeout)
+
+        response_headers = dict(response.headers)
+        if 'retry-after' in response.headers:
+            response_headers['Retry-After'] = response.headers['retry-after']
+        return {'status': response.status_code, 'headers': response_headers, 'body': response.text}
+
+    def close(self):
+        self._session.close()
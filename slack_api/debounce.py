@@ -0,0 +1,54 @@
+import threading
+import traceback
+from typing import Callable, Optional
+
+from django.db import connection
+
+
+class Debouncer:
+    """
+    Coalesces calls made within a window into one: the first call schedules a flush after window seconds
+    which runs only the latest of the calls made meanwhile, in a background thread.
+    With a zero window calls run at once in the calling thread.
+    """
+
+    def __init__(self, window: float):
+        self._window = window
+        self._pending: Optional[Callable] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def call(self, action: Callable):
+        if self._window <= 0:
+            action()
+            return
+
+        with self._lock:
+            self._pending = action
+            if self._timer is None:
+                self._timer = threading.Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Runs the pending call, if there is one."""
+        in_timer = isinstance(threading.current_thread(), threading.Timer)
+        with self._flush_lock:
+            with self._lock:
+                action, self._pending = self._pending, None
+                if self._timer is not None and not in_timer:
+                    self._timer.cancel()
+                self._timer = None
+            if action is None:
+                return
+
+            try:
+                action()
+            except Exception as ex:
+                print("Failed running debounced call")
+                print(ex)
+                traceback.print_exc()
+            finally:
+                if in_timer:
+                    connection.close()  # the timer thread has its own DB connection
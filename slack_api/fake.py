@@ -0,0 +1,100 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs
+
+
+class FakeSlack:
+    """
+    Local stand-in for the Slack Web API methods used by SlackApi (under /api/) and for response URLs
+    (under /response/), answering after given latency and rate limiting a share of the calls.
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limited: float = 0.0, retry_after: int = 1, port: int = 0):
+        """
+        :param latency: seconds each request takes.
+        :param rate_limited: share of Web API calls answered by 429 Too Many Requests.
+        :param retry_after: Retry-After of the rate limited responses (seconds).
+        """
+        self.latency = latency
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.calls = Counter()  # by method, responses by their path
+        self.responses = {}  # response path -> time it was received
+        self._lock = threading.Lock()
+        self._ts = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    @property
+    def api_url(self) -> str:
+        """Base URL of the Web API, for SLACK_API_URL."""
+        return self.url + '/api/'
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='fake-slack', daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _answer(self, path: str, arguments: dict) -> Tuple[int, dict]:
+        time.sleep(self.latency)
+        if path.startswith('/response/'):
+            with self._lock:
+                self.calls['response_url'] += 1
+                self.responses[path] = time.monotonic()
+            return 200, {}
+
+        method = path[len('/api/'):]
+        with self._lock:
+            self.calls[method] += 1
+            if random.random() < self.rate_limited:
+                self.calls['rate_limited'] += 1
+                return 429, {'ok': False, 'error': 'ratelimited'}
+            self._ts += 1
+            ts = f'{int(time.time())}.{self._ts:06d}'
+
+        if method in ('chat.postMessage', 'chat.update'):
+            return 200, {'ok': True, 'channel': arguments.get('channel'), 'ts': arguments.get('ts', ts)}
+        elif method == 'conversations.open':
+            return 200, {'ok': True, 'channel': {'id': 'D' + arguments.get('users', '')}}
+        elif method in ('chat.delete', 'dialog.open'):
+            return 200, {'ok': True}
+        return 404, {'ok': False, 'error': 'unknown_method'}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8')
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    arguments = json.loads(body or '{}')
+                else:
+                    arguments = {k: v[0] for k, v in parse_qs(body).items()}
+
+                status, response = fake._answer(self.path, arguments)
+                content = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', str(fake.retry_after))
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
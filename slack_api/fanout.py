@@ -0,0 +1,93 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from django.db import connection
+
+from slack_api.api import SlackApi
+
+
+@dataclass
+class FanOutReport:
+    recipients: int
+    failures: int
+    retries: int
+    duration: float
+    calls: int = 0
+    latency: float = 0.0  # total seconds spent in Web API requests
+    skipped: int = 0  # updates of unchanged messages not sent
+
+    def __str__(self):
+        mean = self.latency / self.calls * 1000 if self.calls else 0.0
+        return f'{self.recipients - self.failures}/{self.recipients} recipients in {self.duration:.1f} s, ' \
+               f'{self.calls} API calls ({mean:.0f} ms mean), {self.skipped} unchanged messages skipped, ' \
+               f'{self.retries} rate limit retries, {self.failures} failures'
+
+
+class _Latency:
+    """
+    SlackApi call hook summing up the calls made and the time spent in them.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, method: str, seconds: float, status):
+        with self._lock:
+            self.calls += 1
+            self.total += seconds
+
+
+class FanOut:
+    """
+    Delivers messages to many recipients concurrently, with bounded parallelism (a single worker delivers inline).
+    Rate limits are respected by SlackApi, which makes the workers wait when needed.
+    """
+
+    def __init__(self, api: SlackApi, workers: int):
+        self._api = api
+        self._workers = workers
+
+    def run(self, recipients: Iterable, deliver: Callable) -> FanOutReport:
+        recipients = list(recipients)
+        retries = self._api.retries
+        latency = _Latency()
+        self._api.add_call_hook(latency)
+        start = time.monotonic()
+
+        try:
+            if self._workers > 1:
+                with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                    delivered = list(executor.map(lambda r: FanOut._deliver(deliver, r, in_worker=True), recipients))
+            else:
+                delivered = [FanOut._deliver(deliver, r, in_worker=False) for r in recipients]
+        finally:
+            self._api.remove_call_hook(latency)
+
+        return FanOutReport(
+            recipients=len(recipients),
+            failures=delivered.count(False),
+            retries=self._api.retries - retries,
+            duration=time.monotonic() - start,
+            calls=latency.calls,
+            latency=latency.total
+        )
+
+    @staticmethod
+    def _deliver(deliver: Callable, recipient, in_worker: bool) -> bool:
+        try:
+            deliver(recipient)
+            return True
+        except Exception as ex:
+            print(f"Failed delivering to {recipient}")
+            print(ex)
+            traceback.print_exc()
+            return False
+        finally:
+            if in_worker:
+                connection.close()  # each worker thread has its own DB connection
@@ -0,0 +1,80 @@
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+
+from lunchinator.models import SlackMessage
+
+
+@dataclass(frozen=True)
+class SentMessage:
+    ts: str
+    fingerprint: str = ''  # of the text and blocks last sent, see SlackSender._fingerprint
+
+
+class MessageStore:
+    """
+    Messages sent today by recipient (user or channel id), kind and key (e.g. restaurant id).
+
+    They are stored in the DB, so that messages keep being updated rather than re-posted after a restart
+    and by other workers. Reads always go to the DB, as other workers may have updated a message since,
+    the process only remembers which rows exist to write them with the fitting statement first.
+    """
+    SELECTIONS = 'selections'
+    USER_SELECTION = 'user_selection'
+    RESTAURANTS = 'restaurants'
+    RECOMMENDATIONS = 'recommendations'
+    MEALS = 'meals'
+    CONTROLS = 'controls'
+    DIGEST = 'digest'
+
+    def __init__(self):
+        self._stored = set()
+        self._lock = threading.Lock()
+
+    def get(self, recipient: str, kind: str, key: str = '') -> Optional[SentMessage]:
+        row = SlackMessage.objects \
+            .filter(date=date.today(), recipient=recipient, kind=kind, key=str(key)) \
+            .values_list('ts', 'fingerprint') \
+            .first()
+        return None if row is None else SentMessage(*row)
+
+    def messages(self, recipient: str) -> dict:
+        """:returns dict of (kind, key) -> SentMessage of all today's messages sent to recipient."""
+        return {
+            (kind, key): SentMessage(ts, fingerprint) for kind, key, ts, fingerprint in SlackMessage.objects
+            .filter(date=date.today(), recipient=recipient)
+            .values_list('kind', 'key', 'ts', 'fingerprint')
+        }
+
+    def set(self, recipient: str, kind: str, ts: str, key: str = '', fingerprint: str = ''):
+        fields = {'date': date.today(), 'recipient': recipient, 'kind': kind, 'key': str(key)}
+        stored_key = tuple(fields.values())
+        with self._lock:
+            stored = stored_key in self._stored
+        # not update_or_create: SQLite fails at once rather than waiting when a transaction which has read
+        # is to write while another one is writing, as many threads of the fan-out do
+        rows = SlackMessage.objects.filter(**fields)
+        # a message stored before is updated, an unknown one is most likely new
+        if not stored or not rows.update(ts=ts, fingerprint=fingerprint):
+            try:
+                with transaction.atomic():
+                    SlackMessage.objects.create(ts=ts, fingerprint=fingerprint, **fields)
+            except IntegrityError:
+                rows.update(ts=ts, fingerprint=fingerprint)
+        with self._lock:
+            self._stored.add(stored_key)
+
+    def delete(self, recipient: str, kind: str, key: str = ''):
+        fields = {'date': date.today(), 'recipient': recipient, 'kind': kind, 'key': str(key)}
+        SlackMessage.objects.filter(**fields).delete()
+        with self._lock:
+            self._stored.discard(tuple(fields.values()))
+
+    def reset(self):
+        """Forgets today's messages, so that new ones are sent."""
+        SlackMessage.objects.filter(date=date.today()).delete()
+        with self._lock:
+            self._stored = set()
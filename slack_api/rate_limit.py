@@ -0,0 +1,76 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token buckets of Slack Web API methods, following Slack's per-method rate limit tiers.
+    chat.postMessage is limited per channel instead.
+    """
+
+    PER_MINUTE = {
+        'chat_update': 50,  # Tier 3
+        'chat_delete': 50,  # Tier 3
+        'conversations_open': 50,  # Tier 3
+        'dialog_open': 100,  # Tier 4
+    }
+    PER_CHANNEL_PER_MINUTE = {
+        'chat_postMessage': 60,  # about one message per second and channel
+    }
+    BURST_SECONDS = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def acquire(self, method: str, channel: str = None):
+        """Blocks until the method may be called."""
+        while True:
+            with self._lock:
+                bucket = self._bucket(method, channel)
+                if bucket is None:
+                    return
+                wait = bucket.take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, method: str, channel: str, seconds: float):
+        """Holds calls of the method back, e.g. for the Retry-After of a rate limited response."""
+        with self._lock:
+            bucket = self._bucket(method, channel)
+            if bucket is not None:
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+
+    def _bucket(self, method: str, channel: str):
+        if method in self.PER_CHANNEL_PER_MINUTE:
+            key, per_minute = (method, channel), self.PER_CHANNEL_PER_MINUTE[method]
+        elif method in self.PER_MINUTE:
+            key, per_minute = method, self.PER_MINUTE[method]
+        else:
+            return None
+        if key not in self._buckets:
+            self._buckets[key] = _Bucket(per_minute / 60, max(1, per_minute * self.BURST_SECONDS // 60))
+        return self._buckets[key]
+
+
+class _Bucket:
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def take(self) -> float:
+        """Takes a token, or returns seconds to wait for one."""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
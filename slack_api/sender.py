@@ -1,95 +1,276 @@
-import os
+import hashlib
 import itertools
+import json
+import os
+import threading
+from concurrent.futures import Future
 from datetime import date
+from typing import Callable, Optional
 
+from django.conf import settings
 from unidecode import unidecode
 
 from lunchinator.models import User, Meal, Restaurant
 from slack_api.api import SlackApi
+from slack_api.debounce import Debouncer
+from slack_api.fanout import FanOut, FanOutReport
+from slack_api.messages import MessageStore, SentMessage
+
+
+class UpdateStats:
+    """
+    Counts of messages sent (or updated) and of updates skipped as the message had not changed.
+    """
+
+    def __init__(self, sent: int = 0, skipped: int = 0):
+        self.sent = sent
+        self.skipped = skipped
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return f'{self.sent} messages sent, {self.skipped} unchanged skipped'
+
+    def count(self, skipped: bool):
+        with self._lock:
+            if skipped:
+                self.skipped += 1
+            else:
+                self.sent += 1
+
+    def copy(self, reset: bool = False) -> 'UpdateStats':
+        with self._lock:
+            stats = UpdateStats(self.sent, self.skipped)
+            if reset:
+                self.sent = self.skipped = 0
+            return stats
+
+
+class _RestaurantMealBlocks:
+    """
+    Blocks of a restaurant's meals rendered once with both states of each meal's vote button,
+    so that per-user messages only pick the right state.
+    """
+
+    def __init__(self, restaurant: Restaurant, meals: list):
+        self._header = [
+            {"type": "section", "text": {"type": "mrkdwn", "text": f"*{restaurant.name}*"}},
+            {"type": "divider"}
+        ]
+        self._meals = [
+            (m.pk, SlackSender._meal_voting_block(m, True), SlackSender._meal_voting_block(m, False)) for m in meals
+        ]
+        if not meals:
+            self._header.append({
+                "type": "section",
+                "text": {"type": "plain_text", "text": "<none>"},
+            })
+
+    def render(self, user_meals_pks: Optional[set]) -> list:
+        return self._header + [
+            vote if (user_meals_pks is not None) and (pk not in user_meals_pks) else unvote
+            for pk, vote, unvote in self._meals
+        ]
+
+
+class _MealBlocksCache:
+    """
+    The rendered meal blocks of each restaurant, rendered again whenever its meals (their ids, names or prices)
+    or its name differ from the ones they were rendered from.
+    """
+
+    def __init__(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def get(self, restaurant: Restaurant, meals: list) -> _RestaurantMealBlocks:
+        meals = list(meals)
+        signature = (restaurant.name, tuple((m.pk, m.name, m.price) for m in meals))
+        with self._lock:
+            cached = self._blocks.get(restaurant.pk)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        blocks = _RestaurantMealBlocks(restaurant, meals)
+        with self._lock:
+            self._blocks[restaurant.pk] = (signature, blocks)
+        return blocks
+
+
+_meal_blocks = _MealBlocksCache()
 
 
 class SlackSender:
+    DIGEST_BLOCKS = 50  # Block Kit limit of a message
+    _DIGEST_FOOTER_BLOCKS = 5
 
     def __init__(self):
         self._lunch_channel = os.environ['LUNCHINATOR_LUNCH_CHANNEL']
-        self._api = SlackApi()
-
-        self._selection_message = None
-        self._user_selection_message = {}
-        self._restaurants_user_message = {}
-        self._recommendations_user_message = {}
-        self._meals_user_restaurants_messages = {}
-        self._other_actions_user_message_sent = set()
+        self._api = SlackApi(channels=SlackSender._load_channels, on_channel_open=SlackSender._save_channel)
+        self._messages = MessageStore()
+        self._selections_debouncer = Debouncer(settings.SLACK_SELECTIONS_DEBOUNCE)
+        self._updates = UpdateStats()
 
     def reset(self):
-        self._selection_message = None
-        self._user_selection_message = {}
-        self._restaurants_user_message = {}
-        self._recommendations_user_message = {}
-        self._meals_user_restaurants_messages = {}
-        self._other_actions_user_message_sent = set()
-
-    def send_meals(self, user: User, restaurants: list):
-        meals = {r: r.meals.filter(date=date.today()).all() for r in restaurants}
-        favourite_restaurants = set(user.all_favorite_restaurants())
-        user_meals_pks = {s.meal.pk for s in user.selections.filter(meal__date=date.today()).all()}
+        self._messages.reset()
+
+    @staticmethod
+    def _load_channels() -> dict:
+        return dict(User.objects.exclude(slack_channel=None).values_list('slack_id', 'slack_channel'))
 
-        if user.slack_id not in self._meals_user_restaurants_messages:
-            self._meals_user_restaurants_messages[user.slack_id] = {}
+    @staticmethod
+    def _save_channel(user_id: str, channel: str):
+        User.objects.filter(slack_id=user_id).update(slack_channel=channel)
+
+    def send_meals_to_users(self, users: list, restaurants: list) -> FanOutReport:
+        restaurants = list(restaurants)
+        fan_out = FanOut(self._api, settings.SLACK_FANOUT_WORKERS)
+        skipped = self._updates.skipped
+        meals = SlackSender.today_meals(restaurants)
+        report = fan_out.run(users, lambda user: self.send_meals(user, restaurants, meals=meals))
+        report.skipped = self._updates.skipped - skipped
+        return report
+
+    def update_stats(self, reset: bool = False) -> 'UpdateStats':
+        """:returns counts of messages sent and of updates skipped as nothing changed (since the last reset)."""
+        return self._updates.copy(reset)
+
+    def send_meals(self, user: User, restaurants: list, page: int = None, meals: dict = None):
+        """Sends (or updates) the messages with today's meals of the user's favourite restaurants,
+            of the given restaurants only, unless the user gets a digest.
+
+            :param page: page of the digest to show, the first one showing any of the restaurants by default.
+            :param meals: today's meals of the restaurants (see today_meals) if already loaded.
+        """
+        sent = self._messages.messages(user.slack_id)
+        if user.digest:
+            self._delete_meal_messages(user, sent)
+            self._send_digest(user, restaurants, page, sent.get((MessageStore.DIGEST, '')))
+            return
+        if (MessageStore.DIGEST, '') in sent:
+            self._delete(user.slack_id, MessageStore.DIGEST, sent[(MessageStore.DIGEST, '')])
+
+        if meals is None:
+            meals = SlackSender.today_meals(restaurants)
+        favourite_restaurants = set(user.all_favorite_restaurants())
+        user_meals_pks = user.today_meal_pks()
+        sent_meals = {key: message for (kind, key), message in sent.items() if kind == MessageStore.MEALS}
 
         for restaurant in meals.keys():
             if (restaurant in favourite_restaurants) or (restaurant.name == Restaurant.ADHOC_NAME):
                 blocks = SlackSender.restaurant_meal_blocks(restaurant, meals[restaurant], user_meals_pks)
+                self._send_or_update(MessageStore.MEALS, user.slack_id, restaurant.name, blocks,
+                                     key=str(restaurant.pk), sent=sent_meals.get(str(restaurant.pk)), lookup=False)
+
+        for restaurant_id in set(sent_meals.keys()).difference({str(r.pk) for r in favourite_restaurants}):
+            if any(str(r.pk) == restaurant_id and r.name != Restaurant.ADHOC_NAME for r in meals.keys()):
+                self._delete(user.slack_id, MessageStore.MEALS, sent_meals[restaurant_id], key=restaurant_id)
+
+        if (MessageStore.CONTROLS, '') not in sent:
+            ts = self._send_other_controls(user.slack_id)
+            self._messages.set(user.slack_id, MessageStore.CONTROLS, ts)
+
+    def _send_digest(self, user: User, restaurants: list, page: Optional[int], sent: Optional[SentMessage]):
+        favourite_restaurants = list(user.all_favorite_restaurants())
+        adhoc_restaurants = list(Restaurant.objects.filter(name=Restaurant.ADHOC_NAME))
+        meals = {}
+        for meal in Meal.objects.filter(date=date.today(), restaurant__in=favourite_restaurants + adhoc_restaurants):
+            meals.setdefault(meal.restaurant_id, []).append(meal)
+        user_meals_pks = user.today_meal_pks()
+
+        sections = [
+            (r, SlackSender.restaurant_meal_blocks(r, meals.get(r.pk, []), user_meals_pks))
+            for r in favourite_restaurants + [r for r in adhoc_restaurants if r.pk in meals]
+        ]
+        pages = SlackSender._digest_pages(sections, SlackSender.DIGEST_BLOCKS - SlackSender._DIGEST_FOOTER_BLOCKS)
+        if page is None:
+            changed = {r.pk for r in restaurants}
+            page = next((i for i, p in enumerate(pages) if any(r.pk in changed for r, _ in p)), 0)
+        page = min(max(page, 0), len(pages) - 1)
+
+        blocks = [b for _, section in pages[page] for b in section] + SlackSender._digest_footer(page, len(pages))
+        self._send_or_update(MessageStore.DIGEST, user.slack_id, "Today's lunch menu", blocks, sent=sent, lookup=False)
+
+    @staticmethod
+    def _digest_pages(sections: list, size: int) -> list:
+        """Splits (restaurant, blocks) sections into pages of at most size blocks, not splitting a restaurant
+            unless it does not fit a page on its own.
+        """
+        pages = [[]]
+        used = 0
+        for restaurant, blocks in sections:
+            for start in range(0, len(blocks), size):
+                chunk = blocks[start:start + size]
+                if used + len(chunk) > size and pages[-1]:
+                    pages.append([])
+                    used = 0
+                pages[-1].append((restaurant, chunk))
+                used += len(chunk)
+        return pages
+
+    @staticmethod
+    def _digest_footer(page: int, page_count: int) -> list:
+        footer = [{"type": "divider"}]
+        if page_count > 1:
+            footer.append({
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": text},
+                        "action_id": f"digest_page_{target}",
+                        "value": str(target)
+                    } for text, target in (("< previous", page - 1), ("next >", page + 1)) if 0 <= target < page_count
+                ]
+            })
+            footer.append({"type": "context", "elements": [
+                {"type": "plain_text", "text": f"Page {page + 1} of {page_count}"}
+            ]})
+        return footer + SlackSender._other_controls_blocks(digest=True)
+
+    def _delete_meal_messages(self, user: User, sent: dict):
+        for (kind, key), message in sent.items():
+            if kind in (MessageStore.MEALS, MessageStore.CONTROLS):
+                self._delete(user.slack_id, kind, message, key=key)
 
-                if restaurant.pk in self._meals_user_restaurants_messages[user.slack_id]:
-                    ts = self._api.update_message(
-                        self._api.user_channel(user.slack_id),
-                        self._meals_user_restaurants_messages[user.slack_id][restaurant.pk],
-                        restaurant.name,
-                        blocks
-                    )
-                else:
-                    ts = self._api.message(self._api.user_channel(user.slack_id), restaurant.name, blocks)
-                self._meals_user_restaurants_messages[user.slack_id][restaurant.pk] = ts
-
-        for restaurant_id in set(self._meals_user_restaurants_messages[user.slack_id].keys()) \
-                .difference({r.pk for r in favourite_restaurants}):
-            if any(r.pk == restaurant_id and r.name != Restaurant.ADHOC_NAME for r in meals.keys()):
-                self._api.delete_message(
-                    self._api.user_channel(user.slack_id),
-                    self._meals_user_restaurants_messages[user.slack_id][restaurant_id]
-                )
-                self._meals_user_restaurants_messages[user.slack_id].pop(restaurant_id)
-
-        if user.slack_id not in self._other_actions_user_message_sent:
-            self._send_other_controls(user.slack_id)
-            self._other_actions_user_message_sent.add(user.slack_id)
+    def _delete(self, user_id: str, kind: str, sent: SentMessage, key: str = ''):
+        self._api.delete_message(self._api.user_channel(user_id), sent.ts)
+        self._messages.delete(user_id, kind, key=key)
+
+    @staticmethod
+    def today_meals(restaurants: list) -> dict:
+        """:returns dict of restaurant -> list of its meals today, loaded by a single query."""
+        restaurants = list(restaurants)
+        meals = {r: [] for r in restaurants}
+        by_pk = {r.pk: r for r in restaurants}
+        for meal in Meal.objects.filter(date=date.today(), restaurant__in=restaurants):
+            meal.restaurant = by_pk[meal.restaurant_id]
+            meals[meal.restaurant].append(meal)
+        return meals
 
     @staticmethod
     def restaurant_meal_blocks(restaurant: Restaurant, meals: list, user_meals_pks: set):
+        """Blocks of the restaurant's meals with Vote buttons, or Unvote ones for meals in user_meals_pks.
+
+            The blocks are shared with other users' messages and must not be modified.
+        """
+        return _meal_blocks.get(restaurant, meals).render(user_meals_pks)
+
+    def _send_other_controls(self, userid: str) -> str:
         blocks = [
-                     {"type": "section", "text": {"type": "mrkdwn", "text": f"*{restaurant.name}*"}},
-                     {"type": "divider"}
-                 ] + [
-                     SlackSender._meal_voting_block(m, (user_meals_pks is not None) and (m.pk not in user_meals_pks)) for m in meals
-                 ]
-        if not meals:
-            blocks.append({
-                "type": "section",
-                "text": {"type": "plain_text", "text": "<none>"},
-            })
-        return blocks
+            {"type": "section", "text": {"type": "mrkdwn", "text": "*Other Controls*"}},
+            {"type": "divider"}
+        ] + SlackSender._other_controls_blocks(digest=False)
+        return self._api.message(self._api.user_channel(userid), "Other Controls", blocks)
 
-    def _send_other_controls(self, userid: str):
+    @staticmethod
+    def _other_controls_blocks(digest: bool) -> list:
         confirm_dialog = {
             "title": {"type": "plain_text", "text": "Quitting Lunchinator"},
             "text": {"type": "plain_text", "text": "You really mean it?"},
             "confirm": {"type": "plain_text", "text": "oh really"},
             "deny": {"type": "plain_text", "text": "nope"}
         }
-        blocks = [
-            {"type": "section", "text": {"type": "mrkdwn", "text": "*Other Controls*"}},
-            {"type": "divider"},
+        return [
             {
                 "type": "actions",
                 "elements": [
@@ -98,6 +279,11 @@ class SlackSender:
                         "type": "button",
                         "text": {"type": "plain_text", "text": "my selection"},
                         "action_id": "print_selection"
+                    },
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "message per restaurant" if digest else "single message"},
+                        "action_id": "toggle_digest"
                     }
                 ]
             }, {
@@ -124,7 +310,6 @@ class SlackSender:
                 ]
             }
         ]
-        self._api.message(self._api.user_channel(userid), "Other Controls", blocks)
 
     def invite(self, userid: str):
         blocks = [
@@ -146,10 +331,10 @@ class SlackSender:
         self._api.user_dialog(trigger_id)
 
     def print_recommendation(self, recs: list, user: User):
-        user_meals_pks = {s.meal.pk for s in user.selections.filter(meal__date=date.today()).all()}
+        user_meals_pks = user.today_meal_pks()
         text = "*Recommendations*"
         blocks = SlackSender.recommendation_blocks(text, recs, user_meals_pks)
-        self._send_or_update(self._recommendations_user_message, user.slack_id, text, blocks)
+        self._send_or_update(MessageStore.RECOMMENDATIONS, user.slack_id, text, blocks)
 
     @staticmethod
     def recommendation_blocks(title: str, recommendations: list, user_meals_pks: set):
@@ -187,7 +372,7 @@ class SlackSender:
     def print_restaurants(self, user_id: str, restaurants: list, selected_restaurants: list):
         text = "*Available Restaurants*"
         blocks = SlackSender.restaurant_blocks(text, restaurants, {r.pk for r in selected_restaurants})
-        self._send_or_update(self._restaurants_user_message, user_id, text, blocks)
+        self._send_or_update(MessageStore.RESTAURANTS, user_id, text, blocks)
 
     @staticmethod
     def restaurant_blocks(title: str, restaurants: list, selected_ids: set):
@@ -213,6 +398,17 @@ class SlackSender:
                    } for restaurant in restaurants
                ]
 
+    def post_selections_later(self, selections: Callable[[], list]):
+        """Posts the selections soon, coalescing the updates requested within SLACK_SELECTIONS_DEBOUNCE seconds.
+
+            :param selections: returns the selections to post, called when they are being posted.
+        """
+        self._selections_debouncer.call(lambda: self.post_selections(selections()))
+
+    def flush_selections(self):
+        """Posts the selections requested by post_selections_later now, if there are any."""
+        self._selections_debouncer.flush()
+
     def post_selections(self, selections: list):
         restaurant_users = [
             (s.meal.restaurant, s.user) for s in selections if s.meal.restaurant.name != Restaurant.ADHOC_NAME
@@ -227,11 +423,7 @@ class SlackSender:
         if adhoc_meal_users:
             blocks.extend(SlackSender._selections_entity_to_blocks(adhoc_meal_users))
 
-        if self._selection_message is None:
-            ts = self._api.message(self._lunch_channel, text, blocks)
-        else:
-            ts = self._api.update_message(self._lunch_channel, self._selection_message, text, blocks)
-        self._selection_message = ts
+        self._send_or_update(MessageStore.SELECTIONS, self._lunch_channel, text, blocks, channel=self._lunch_channel)
 
     @staticmethod
     def _selections_entity_to_blocks(entity_users: list):
@@ -239,7 +431,7 @@ class SlackSender:
             return ent_user[0].name
 
         entity_users_grouped = [
-            (entity, {entity_user[1].slack_id for entity_user in entity_users})
+            (entity, sorted({entity_user[1].slack_id for entity_user in entity_users}))
             for entity, entity_users in itertools.groupby(sorted(entity_users, key=key_fun), key_fun)
         ]
         return [
@@ -269,22 +461,41 @@ class SlackSender:
                 "text": {"type": "plain_text", "text": "<none>"},
             })
 
-        self._send_or_update(self._user_selection_message, user_id, text, blocks)
+        self._send_or_update(MessageStore.USER_SELECTION, user_id, text, blocks)
+
+    def send_response(self, response_url: str, response: dict) -> Future:
+        return self._api.send_response(response_url, response)
 
     def message(self, userid: str, msg: str):
         self._api.message(self._api.user_channel(userid), msg)
 
-    def _send_or_update(self, messages_dict, user_id, text, blocks):
-        if user_id in messages_dict:
-            ts = self._api.update_message(
-                self._api.user_channel(user_id),
-                messages_dict[user_id],
-                text,
-                blocks
-            )
+    def _send_or_update(self, kind: str, recipient: str, text: str, blocks: list,
+                        key: str = '', channel: str = None, sent: SentMessage = None, lookup: bool = True):
+        """Sends the message of the kind to recipient (the user's DM channel unless channel is given) or updates
+            the one sent before, unless it already has the same text and blocks.
+
+            :param sent: the message sent before if known, looked up otherwise.
+            :param lookup: whether to look the message up when sent is None, rather than take it as not sent yet.
+        """
+        fingerprint = SlackSender._fingerprint(text, blocks)
+        if sent is None and lookup:
+            sent = self._messages.get(recipient, kind, key)
+        if sent is not None and sent.fingerprint == fingerprint:
+            self._updates.count(skipped=True)
+            return
+
+        channel = channel or self._api.user_channel(recipient)
+        if sent is not None:
+            ts = self._api.update_message(channel, sent.ts, text, blocks)
         else:
-            ts = self._api.message(self._api.user_channel(user_id), text, blocks)
-        messages_dict[user_id] = ts
+            ts = self._api.message(channel, text, blocks)
+        self._updates.count(skipped=False)
+        self._messages.set(recipient, kind, ts, key=key, fingerprint=fingerprint)
+
+    @staticmethod
+    def _fingerprint(text: str, blocks: list) -> str:
+        rendered = json.dumps({'text': text, 'blocks': blocks}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(rendered.encode('utf-8')).hexdigest()
 
     @staticmethod
     def _meal_voting_block(meal: Meal,